@@ -7,40 +7,102 @@ This runs AFTER all analyzers complete to clean up the results
 
 import os
 import json
-import hashlib
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-def hash_secret(raw_secret):
-    """Generate a hash for a secret"""
-    return hashlib.sha256(raw_secret.encode()).hexdigest()[:16]
+# Fast JSON support (optional): orjson parses/serializes in C, stdlib json is the fallback
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode('utf-8')
+
+# Streaming JSON support (optional): lets clean files be checked without loading them whole
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+def count_duplicates_streaming(file_path):
+    """Stream the secrets array and return (original_count, duplicates) without building the document"""
+    original_count = 0
+    duplicates = 0
+    seen_secrets = set()
+    seen_add = seen_secrets.add
+    seen_contains = seen_secrets.__contains__
+    
+    with open(file_path, 'rb') as f:
+        for secret in ijson.items(f, 'secrets.item', use_float=True):
+            original_count += 1
+            raw_secret = secret.get('raw_secret', '')
+            if not raw_secret:
+                continue
+            
+            if seen_contains(raw_secret):
+                duplicates += 1
+            else:
+                seen_add(raw_secret)
+    
+    return original_count, duplicates
 
 def deduplicate_analysis_file(file_path):
     """Deduplicate secrets in a single analysis JSON file"""
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        # Most files are already clean - stream them first and only load the
+        # full document when there is actually something to rewrite
+        if ijson is not None:
+            original_count, duplicates = count_duplicates_streaming(file_path)
+            if duplicates == 0:
+                return original_count, 0
+        
+        data = _loads(Path(file_path).read_bytes())
         
         if 'secrets' not in data or not isinstance(data['secrets'], list):
             return 0, 0  # No secrets to deduplicate
         
         original_count = len(data['secrets'])
-        seen_hashes = set()
+        # Raw values are used directly as set keys - the built-in str hash is
+        # all an in-process dedup needs, no cryptographic digest required
+        seen_secrets = set()
         unique_secrets = []
         
+        # Active/revoked counts are tallied while deduplicating so the
+        # survivors never have to be walked again for the summary
+        active = 0
+        revoked = 0
+        
+        # Bound methods hoisted out of the loop - it can run millions of times
+        seen_add = seen_secrets.add
+        seen_contains = seen_secrets.__contains__
+        unique_append = unique_secrets.append
+        
         for secret in data['secrets']:
-            raw_secret = secret.get('raw_secret', '')
-            if not raw_secret:
-                unique_secrets.append(secret)
-                continue
+            get = secret.get
+            raw_secret = get('raw_secret', '')
+            if raw_secret:
+                if seen_contains(raw_secret):
+                    continue
+                seen_add(raw_secret)
             
-            secret_hash = hash_secret(raw_secret)
-            
-            if secret_hash not in seen_hashes:
-                seen_hashes.add(secret_hash)
-                unique_secrets.append(secret)
+            unique_append(secret)
+            status = get('status')
+            if status == 'ACTIVE':
+                active += 1
+            elif status == 'REVOKED':
+                revoked += 1
         
-        duplicates_removed = original_count - len(unique_secrets)
+        unique_count = len(unique_secrets)
+        duplicates_removed = original_count - unique_count
         
         if duplicates_removed > 0:
             # Update the data
@@ -48,17 +110,12 @@ def deduplicate_analysis_file(file_path):
             
             # Update summary if it exists
             if 'summary' in data:
-                data['summary']['total_secrets'] = len(unique_secrets)
-                
-                # Recalculate active/revoked counts
-                active = sum(1 for s in unique_secrets if s.get('status') == 'ACTIVE')
-                revoked = sum(1 for s in unique_secrets if s.get('status') == 'REVOKED')
-                
+                data['summary']['total_secrets'] = unique_count
                 data['summary']['active_keys'] = active
                 data['summary']['revoked_keys'] = revoked
                 
-                if len(unique_secrets) > 0:
-                    data['summary']['active_percentage'] = round((active * 100.0) / len(unique_secrets), 1)
+                if unique_count > 0:
+                    data['summary']['active_percentage'] = round((active * 100.0) / unique_count, 1)
                 else:
                     data['summary']['active_percentage'] = 0.0
             
@@ -67,11 +124,14 @@ def deduplicate_analysis_file(file_path):
                 data['deduplication'] = {}
             data['deduplication']['duplicates_removed'] = duplicates_removed
             data['deduplication']['original_count'] = original_count
-            data['deduplication']['unique_count'] = len(unique_secrets)
+            data['deduplication']['unique_count'] = unique_count
             
-            # Write back
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            # Write back atomically - a crash mid-write leaves the original
+            # file intact instead of a truncated one
+            file_path = Path(file_path)
+            tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
+            tmp_path.write_bytes(_dumps(data))
+            os.replace(tmp_path, file_path)
         
         return original_count, duplicates_removed
         
@@ -98,23 +158,26 @@ def main():
     total_duplicates = 0
     files_with_duplicates = 0
     
-    # Process each detector directory
-    for detector_dir in sorted(results_dir.iterdir()):
-        if not detector_dir.is_dir():
-            continue
+    # Collect analysis files from each detector directory
+    analysis_files = [
+        analysis_file
+        for detector_dir in sorted(results_dir.iterdir()) if detector_dir.is_dir()
+        for analysis_file in detector_dir.glob("*_analysis.json")
+    ]
+    
+    # Files are independent, so deduplicate them across all cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(deduplicate_analysis_file, analysis_files, chunksize=16)
         
-        # Process each analysis file in the detector directory
-        for analysis_file in detector_dir.glob("*_analysis.json"):
+        for analysis_file, (original, duplicates) in zip(analysis_files, results):
             total_files += 1
-            original, duplicates = deduplicate_analysis_file(analysis_file)
-            
             total_secrets_before += original
             total_duplicates += duplicates
             
             if duplicates > 0:
                 files_with_duplicates += 1
                 org_name = analysis_file.stem.replace('_analysis', '')
-                print(f"  🔄 {detector_dir.name}/{org_name}: Removed {duplicates} duplicate(s) from {original} secret(s)")
+                print(f"  🔄 {analysis_file.parent.name}/{org_name}: Removed {duplicates} duplicate(s) from {original} secret(s)")
     
     print()
     print("=" * 70)
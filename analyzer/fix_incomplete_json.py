@@ -5,17 +5,42 @@ This script repairs JSON files that are missing closing brackets due to interrup
 """
 
 import json
+import os
+import re
 import sys
 from pathlib import Path
 
+# Fast JSON support (optional): orjson parses in C, stdlib json is the fallback
+try:
+    import orjson
+    _loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
 
-def count_brackets(content):
-    """Count open and close brackets in content."""
-    open_square = content.count('[')
-    close_square = content.count(']')
-    open_curly = content.count('{')
-    close_curly = content.count('}')
-    return open_square, close_square, open_curly, close_curly
+
+# String literals (with escapes) or single brackets - strings are matched whole
+# so brackets inside values like "foo[bar]" are never mistaken for structure
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_CLOSERS = {b'[': b']', b'{': b'}'}
+
+
+def find_unclosed_brackets(content):
+    """
+    Return the closing brackets needed to balance *content*, innermost first.
+    Returns None if the brackets are mismatched (corrupt in another way).
+    """
+    stack = []
+    for match in _TOKEN_RE.finditer(content):
+        token = match.group()
+        if token in _CLOSERS:
+            stack.append(_CLOSERS[token])
+        elif token[:1] == b'"':
+            continue
+        elif not stack or stack.pop() != token:
+            return None
+    return b''.join(reversed(stack))
 
 
 def fix_json_file(file_path):
@@ -25,47 +50,44 @@ def fix_json_file(file_path):
     """
     try:
         # First, try to parse as-is
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        raw = Path(file_path).read_bytes()
         
         try:
-            json.loads(content)
+            _loads(raw)
             return False  # File is already valid
-        except json.JSONDecodeError:
+        except _JSONDecodeError:
             pass  # File needs fixing
         
-        # Count brackets
-        open_sq, close_sq, open_cu, close_cu = count_brackets(content)
-        
-        # Calculate missing brackets
-        missing_square = open_sq - close_sq
-        missing_curly = open_cu - close_cu
+        # Find the containers left open, in nesting order
+        closers = find_unclosed_brackets(raw)
         
-        if missing_square <= 0 and missing_curly <= 0:
+        if not closers:
             # No missing brackets, file is corrupt in another way
             return False
         
-        # Add missing brackets
-        fixed_content = content.rstrip()
-        
-        # Add missing curly brackets first (for objects)
-        fixed_content += '}' * missing_curly
+        missing_square = closers.count(b']')
+        missing_curly = closers.count(b'}')
         
-        # Then add missing square brackets (for arrays)
-        fixed_content += ']' * missing_square
+        # Drop a dangling separator left by an interrupted writer, then
+        # close the open containers innermost first
+        fixed_content = raw.rstrip()
+        if fixed_content.endswith(b','):
+            fixed_content = fixed_content[:-1].rstrip()
+        fixed_content += closers
         
         # Verify the fix works
         try:
-            json.loads(fixed_content)
+            _loads(fixed_content)
             
-            # Write back the fixed content
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(fixed_content)
+            # Write back the fixed content atomically
+            tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
+            tmp_path.write_bytes(fixed_content)
+            os.replace(tmp_path, file_path)
             
             print(f"✅ Fixed: {file_path.name} (added {missing_curly} '}}' and {missing_square} ']')")
             return True
             
-        except json.JSONDecodeError as e:
+        except _JSONDecodeError as e:
             print(f"❌ Could not fix: {file_path.name} - {e}")
             return False
             
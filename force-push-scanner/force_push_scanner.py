@@ -18,20 +18,26 @@ import tempfile
 from datetime import timezone
 import subprocess
 import datetime as _dt
-from collections import defaultdict, Counter
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import concurrent.futures
+import queue
 import threading
 import time
 
 # Stdlib additions
 import logging
-from contextlib import suppress
+from contextlib import closing, suppress
 import shutil
 import re
 import os
 import csv
+import functools
+import itertools
+import operator
+import bisect
+import calendar
 
 # Cross-platform color support (Windows, Linux, macOS)
 try:
@@ -43,10 +49,45 @@ except ImportError:
             return ""
     Fore = Style = _Dummy()
 
+# Fast JSON support (optional): orjson parses/serializes in C, stdlib json is the fallback
+try:
+    import orjson
+    _JSONDecodeError = orjson.JSONDecodeError
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    _JSONDecodeError = json.JSONDecodeError
+
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Fast CSV parsing for large events files (optional)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pc = pa_csv = None
+
+_ARROW_MIN_BYTES = 64 * 1024 * 1024  # below this the stdlib csv reader is fast enough
+
+# Vectorised histogram support (optional)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
-# Thread-safe file writing
-_file_lock = threading.Lock()
-_findings_count = 0
+# Guards notification state shared by worker threads
+_notify_lock = threading.Lock()
+_print_lock = threading.Lock()  # Keeps multi-line finding reports whole
 _notified_orgs = set()  # Track organizations that have already been notified
 
 def send_immediate_notification(finding: dict, repo_url: str, org: str) -> None:
@@ -61,11 +102,11 @@ def send_immediate_notification(finding: dict, repo_url: str, org: str) -> None:
             return  # No detector name
         if not finding.get('Raw') and not finding.get('RawV2'):
             return  # No actual secret content
-        if not finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('commit'):
+        if not _git_meta(finding).get('commit'):
             return  # No commit information
             
         # Check if we've already notified for this organization
-        with _file_lock:
+        with _notify_lock:
             if org in _notified_orgs:
                 return  # Already sent first notification for this org
             _notified_orgs.add(org)  # Mark as notified
@@ -83,8 +124,8 @@ def send_immediate_notification(finding: dict, repo_url: str, org: str) -> None:
         temp_finding_file = os.path.join(temp_dir, f"immediate_secret_{org}_{int(time.time())}.json")
         
         # Write the single finding to a temp file
-        with open(temp_finding_file, 'w', encoding='utf-8') as f:
-            json.dump([finding], f, indent=2, ensure_ascii=False)
+        with open(temp_finding_file, 'wb') as f:
+            f.write(_dumps([finding]))
         
         print(f"🚨 FIRST SECRET ALERT: {org} has leaked secrets!")
         print(f"📱 Sending immediate notification (scan continues, more secrets may follow)...")
@@ -115,7 +156,7 @@ def send_immediate_notification(finding: dict, repo_url: str, org: str) -> None:
 def reset_notification_tracking():
     """Reset notification tracking for new scans."""
     global _notified_orgs
-    with _file_lock:
+    with _notify_lock:
         _notified_orgs.clear()
 
 
@@ -129,14 +170,44 @@ class RunCmdError(RuntimeError):
     """Raised when an external command returns a non-zero exit status."""
 
 
+# Abort git transfers that stall below 1 KB/s for 30s instead of waiting out the full timeout
+_GIT_ENV_DEFAULTS = {
+    "GIT_HTTP_LOW_SPEED_LIMIT": "1000",
+    "GIT_HTTP_LOW_SPEED_TIME": "30",
+}
+
+
+_executables: Dict[str, str] = {}
+
+
+def _spawn_args(cmd: List[str], cwd: Path | None) -> Tuple[List[str], Path | None]:
+    """
+    Shape *cmd* for subprocess's posix_spawn fast path, which needs an absolute
+    executable and no cwd: the executable is resolved once via PATH and git
+    receives its working directory as `-C` instead.
+    """
+    exe = _executables.get(cmd[0])
+    if exe is None:
+        exe = _executables[cmd[0]] = shutil.which(cmd[0]) or cmd[0]
+    argv = [exe, *cmd[1:]]
+    if cwd is not None and cmd[0] == "git":
+        argv[1:1] = ["-C", str(cwd)]
+        cwd = None
+    return argv, cwd
+
+
 def run(cmd: List[str], cwd: Path | None = None, timeout_seconds: int = 900) -> str:
     """Execute *cmd* and return its *stdout* as *str*."""
     logging.debug("Running command: %s (cwd=%s, timeout=%ds)", " ".join(cmd), cwd or ".", timeout_seconds)
     try:
-        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        env = {**_GIT_ENV_DEFAULTS, **os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        argv, cwd = _spawn_args(cmd, cwd)
+        # Our own descriptors are non-inheritable (PEP 446), so skipping the
+        # close_fds sweep is safe and lets CPython use posix_spawn
         proc = subprocess.run(
-            cmd,
+            argv,
             cwd=cwd,
+            close_fds=False,
             capture_output=True,
             text=True,
             encoding="utf-8",
@@ -154,7 +225,71 @@ def run(cmd: List[str], cwd: Path | None = None, timeout_seconds: int = 900) ->
         raise RunCmdError(f"Command timed out: {' '.join(cmd)}") from err
 
 
-def estimate_repo_scan_time(repo_path: Path, commits: List[dict]) -> int:
+def run_streaming(cmd: List[str], cwd: Path | None = None, timeout_seconds: int = 900) -> Iterator[str]:
+    """Execute *cmd* and yield its *stdout* line by line as it is produced."""
+    logging.debug("Streaming command: %s (cwd=%s, timeout=%ds)", " ".join(cmd), cwd or ".", timeout_seconds)
+    env = {**_GIT_ENV_DEFAULTS, **os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    # stderr goes to a spill file so a chatty process can never fill the pipe and stall stdout
+    with tempfile.TemporaryFile() as stderr_file:
+        argv, spawn_cwd = _spawn_args(cmd, cwd)
+        proc = subprocess.Popen(
+            argv,
+            cwd=spawn_cwd,
+            close_fds=False,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+        )
+        timed_out = threading.Event()
+
+        def _kill_on_timeout() -> None:
+            timed_out.set()
+            proc.kill()
+
+        watchdog = threading.Timer(timeout_seconds, _kill_on_timeout)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            with proc.stdout:
+                yield from proc.stdout
+            returncode = proc.wait()
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+        if timed_out.is_set():
+            raise RunCmdError(f"Command timed out: {' '.join(cmd)}")
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", errors="replace")
+            raise RunCmdError(f"Command failed ({returncode}): {' '.join(cmd)}\n{stderr.strip()}")
+
+
+def measure_repo_size_mb(repo_path: Path) -> float:
+    """Return the on-disk size of *repo_path* in MB (0 if it cannot be determined)."""
+    # Iterative os.scandir walk: DirEntry caches the d_type from readdir, so only
+    # regular files cost a stat call and no Path object is built per entry
+    total = 0
+    stack = [str(repo_path)]
+    try:
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        return 0
+    return total / (1024 * 1024)
+
+
+def estimate_repo_scan_time(repo_size_mb: float, commits: List[str]) -> int:
     """Estimate appropriate timeout based on repository characteristics."""
     base_timeout = 900  # 15 minutes baseline
     
@@ -166,26 +301,23 @@ def estimate_repo_scan_time(repo_path: Path, commits: List[dict]) -> int:
         base_timeout *= 1.5
     
     # Factor 2: Repository size (if available)
-    try:
-        repo_size_mb = sum(f.stat().st_size for f in repo_path.rglob('*') if f.is_file()) / (1024 * 1024)
-        if repo_size_mb > 500:  # Large repo
-            base_timeout *= 2
-        elif repo_size_mb > 100:  # Medium repo
-            base_timeout *= 1.5
-    except Exception:
-        pass  # Size estimation failed, use base timeout
+    if repo_size_mb > 500:  # Large repo
+        base_timeout *= 2
+    elif repo_size_mb > 100:  # Medium repo
+        base_timeout *= 1.5
     
     # Cap at reasonable maximum
     return min(base_timeout, 3600)  # Max 1 hour
 
 
+@functools.lru_cache(maxsize=16)
+def _trufflehog_args(concurrency: str) -> Tuple[str, ...]:
+    """Build (once per concurrency level) the base TruffleHog git-mode arguments."""
+    return ("trufflehog", "git", "--no-update", "--json", "--only-verified", "--concurrency", concurrency)
+
+
 def get_trufflehog_config(repo_size_mb: float = 0, commit_count: int = 0) -> List[str]:
     """Get optimized TruffleHog configuration based on repository characteristics."""
-    base_config = [
-        "trufflehog", "git",
-        "--no-update", "--json", "--only-verified"
-    ]
-    
     # Adjust concurrency based on repository size and commit count
     if repo_size_mb > 1000 or commit_count > 200:
         # Large repositories: reduce concurrency to avoid memory issues
@@ -197,30 +329,23 @@ def get_trufflehog_config(repo_size_mb: float = 0, commit_count: int = 0) -> Lis
         # Small repositories: higher concurrency
         concurrency = "8"
     
-    base_config.extend(["--concurrency", concurrency])
-    
     # Add additional optimizations for large repositories
     if repo_size_mb > 500:
         # For very large repos, we could add more specific filters
         # This is where you could add --include-paths or --exclude-paths if needed
         pass
     
-    return base_config
+    # Callers extend the list, so hand out a fresh copy of the cached arguments
+    return list(_trufflehog_args(concurrency))
 
 
-def scan_with_trufflehog(repo_path: Path, since_commit: str, branch: str, max_retries: int = 2, commits: List[dict] = None) -> List[dict]:
+def scan_with_trufflehog(repo_path: Path, since_commit: str, branch: str, max_retries: int = 2,
+                         commits: List[str] = None, repo_size_mb: float = 0) -> List[dict]:
     """Run trufflehog in git mode, returning the parsed JSON findings."""
     # Estimate appropriate timeout
-    estimated_timeout = estimate_repo_scan_time(repo_path, commits or [])
+    estimated_timeout = estimate_repo_scan_time(repo_size_mb, commits or [])
     timeouts = [estimated_timeout, estimated_timeout * 2, estimated_timeout * 3]
     
-    # Get repository size for optimization
-    repo_size_mb = 0
-    try:
-        repo_size_mb = sum(f.stat().st_size for f in repo_path.rglob('*') if f.is_file()) / (1024 * 1024)
-    except Exception:
-        pass
-    
     for attempt in range(max_retries + 1):
         try:
             timeout_seconds = timeouts[min(attempt, len(timeouts) - 1)]
@@ -231,12 +356,11 @@ def scan_with_trufflehog(repo_path: Path, since_commit: str, branch: str, max_re
             trufflehog_cmd.extend(["--branch", branch, "--since-commit", since_commit])
             trufflehog_cmd.append("file://" + str(repo_path.absolute()))
             
-            stdout = run(trufflehog_cmd, timeout_seconds=timeout_seconds)
-            
+            # Parse findings as TruffleHog emits them instead of buffering all of stdout
             findings: List[dict] = []
-            for line in stdout.splitlines():
-                with suppress(json.JSONDecodeError):
-                    data = json.loads(line)
+            for line in run_streaming(trufflehog_cmd, timeout_seconds=timeout_seconds):
+                with suppress(_JSONDecodeError):
+                    data = _loads(line)
                     # Only include verified findings with the required fields
                     if (data.get('Verified', False) and 
                         data.get('DetectorName') and 
@@ -253,25 +377,43 @@ def scan_with_trufflehog(repo_path: Path, since_commit: str, branch: str, max_re
                 return []
 
 
-def to_year(date_val) -> str:
-    """Return the four-digit year (YYYY) from *date_val* which can be an int (epoch)"""
-    return _dt.datetime.fromtimestamp(int(date_val), tz=timezone.utc).strftime("%Y")
+# UTC epoch of 1 January for every year in the table, searched with bisect
+_YEAR_TABLE_START = 1970
+_YEAR_STARTS = [calendar.timegm((year, 1, 1, 0, 0, 0)) for year in range(_YEAR_TABLE_START, 2101)]
+
+
+def year_of(date_val) -> int:
+    """Return the UTC calendar year of *date_val* (an int epoch)."""
+    ts = int(date_val)
+    i = bisect.bisect_right(_YEAR_STARTS, ts) - 1
+    if 0 <= i < len(_YEAR_STARTS) - 1:
+        return _YEAR_TABLE_START + i
+    # Outside the table - let datetime handle it
+    return _dt.datetime.fromtimestamp(ts, tz=timezone.utc).year
 
 
 _SHA_RE = re.compile(r"^[0-9a-f]{7,40}$")
+_SHA_FULLMATCH = _SHA_RE.fullmatch  # bound once, called per row
+# Per-repository commits stored column-wise: ([before SHA, ...], [timestamp, ...])
+RepoCommits = Tuple[List[str], List[int]]
+
 _EXPECTED_FIELDS = {"repo_org", "repo_name", "before", "timestamp"}
+_READONLY_PRAGMAS = """
+    PRAGMA query_only = 1;
+    PRAGMA mmap_size = 1073741824;
+    PRAGMA cache_size = -262144;
+    PRAGMA temp_store = MEMORY;
+"""
+_PUSHES_QUERY = "SELECT repo_org, repo_name, before, timestamp FROM pushes WHERE repo_org = ?"
 
 
-def _validate_row(input_org: str, row: dict, idx: int) -> tuple[str, str, int | str]:
-    """Validate that *row* contains the required columns and return the tuple."""
-    missing = _EXPECTED_FIELDS - row.keys()
-    if missing:
-        raise ValueError(f"Row {idx} is missing fields: {', '.join(sorted(missing))}")
+def _validate_row(input_org: str, row: tuple, idx: int) -> tuple[str, str, int | str]:
+    """Validate a (repo_org, repo_name, before, timestamp) *row* and return the cleaned tuple."""
+    raw_org, raw_name, raw_before, ts = row
 
-    repo_org = str(row["repo_org"]).strip()
-    repo_name = str(row["repo_name"]).strip()
-    before = str(row["before"]).strip()
-    ts = row["timestamp"]
+    repo_org = str(raw_org).strip()
+    repo_name = str(raw_name).strip()
+    before = str(raw_before).strip()
 
     if not repo_org:
         raise ValueError(f"Row {idx} – 'repo_org' is empty")
@@ -279,7 +421,7 @@ def _validate_row(input_org: str, row: dict, idx: int) -> tuple[str, str, int |
         raise ValueError(f"Row {idx} – 'repo_org' does not match 'input_org': {repo_org} != {input_org}")
     if not repo_name:
         raise ValueError(f"Row {idx} – 'repo_name' is empty")
-    if not _SHA_RE.fullmatch(before):
+    if not _SHA_FULLMATCH(before):
         raise ValueError(f"Row {idx} – 'before' does not look like a commit SHA")
 
     try:
@@ -290,36 +432,100 @@ def _validate_row(input_org: str, row: dict, idx: int) -> tuple[str, str, int |
     return repo_org, repo_name, before, ts_int
 
 
-def _gather_from_iter(input_org: str, rows: List[dict]) -> Dict[str, List[dict]]:
-    """Convert iterable rows into the internal repos mapping."""
-    repos: Dict[str, List[dict]] = defaultdict(list)
-    for idx, row in enumerate(rows, 1):
-        try:
-            repo_org, repo_name, before, ts_int = _validate_row(input_org, row, idx)
-        except ValueError as ve:
-            terminate(str(ve))
-
-        url = f"https://github.com/{repo_org}/{repo_name}"
-        repos[url].append({"before": before, "date": ts_int})
+def _group_commits(input_org: str, rows: Iterable[tuple]) -> Dict[str, RepoCommits]:
+    """Group already-validated (repo_name, before, timestamp) rows into the internal repos mapping."""
+    repos: Dict[str, RepoCommits] = {}
+    # Position of each "before" within its repo - repeated force-pushes of the
+    # same tip are kept once, with the latest timestamp
+    positions: Dict[str, Dict[str, int]] = {}
+    for repo_name, before, ts_int in rows:
+        url = f"https://github.com/{input_org}/{repo_name}"
+        commits = repos.get(url)
+        if commits is None:
+            commits = repos[url] = ([], [])
+            positions[url] = {}
+        seen = positions[url]
+        pos = seen.get(before)
+        if pos is None:
+            seen[before] = len(commits[0])
+            commits[0].append(before)
+            commits[1].append(ts_int)
+        elif ts_int > commits[1][pos]:
+            commits[1][pos] = ts_int
     if not repos:
         terminate("No force-push events found for that user – dataset empty")
     return repos
 
 
+def _gather_from_iter(input_org: str, rows: Iterable[tuple]) -> Dict[str, RepoCommits]:
+    """Convert iterable (repo_org, repo_name, before, timestamp) rows into the internal repos mapping."""
+    def validated() -> Iterator[tuple]:
+        for idx, row in enumerate(rows, 1):
+            try:
+                _, repo_name, before, ts_int = _validate_row(input_org, row, idx)
+            except ValueError as ve:
+                terminate(str(ve))
+            yield repo_name, before, ts_int
+
+    return _group_commits(input_org, validated())
+
+
+def _gather_from_arrow(input_org: str, events_file: Path) -> Dict[str, RepoCommits]:
+    """Parse a large events CSV with pyarrow's multi-threaded reader and validate it column-wise."""
+    fields = ("repo_org", "repo_name", "before", "timestamp")
+    try:
+        # Everything is read as strings so validation behaves exactly like the csv path
+        table = pa_csv.read_csv(
+            events_file,
+            convert_options=pa_csv.ConvertOptions(column_types={f: pa.string() for f in fields}),
+        )
+    except Exception as exc:
+        terminate(f"Failed to parse events file {events_file}: {exc}")
+
+    missing = _EXPECTED_FIELDS - set(table.column_names)
+    if missing:
+        terminate(f"Events file is missing fields: {', '.join(sorted(missing))}")
+
+    # Validate whole columns at once; when every row passes only the grouping
+    # loop runs in Python, otherwise fall back to the per-row path for its errors
+    org, name, before, ts = (pc.utf8_trim_whitespace(table.column(f)) for f in fields)
+    valid = pc.and_(
+        pc.and_(pc.equal(org, input_org), pc.not_equal(name, "")),
+        pc.and_(pc.match_substring_regex(before, _SHA_RE.pattern), pc.match_substring_regex(ts, r"^-?[0-9]+$")),
+    )
+    if pc.all(pc.fill_null(valid, False)).as_py():
+        with suppress(pa.ArrowInvalid):
+            ts = pc.cast(ts, pa.int64())
+            del table, org, valid
+            return _group_commits(input_org, zip(name.to_pylist(), before.to_pylist(), ts.to_pylist()))
+
+    columns = [table.column(f).to_pylist() for f in fields]
+    del table
+    return _gather_from_iter(input_org, zip(*columns))
+
+
 def gather_commits(input_org: str, events_file: Optional[Path] | None = None,
-                   db_file: Optional[Path] | None = None) -> Dict[str, List[dict]]:
-    """Return mapping of repo URL → list[{before, pushed_at}]."""
+                   db_file: Optional[Path] | None = None) -> Dict[str, RepoCommits]:
+    """Return mapping of repo URL → ([before, ...], [pushed_at, ...])."""
     if events_file is not None:
         if not events_file.exists():
             terminate(f"Events file not found: {events_file}")
-        rows: List[dict] = []
+        if pa_csv is not None and events_file.stat().st_size >= _ARROW_MIN_BYTES:
+            return _gather_from_arrow(input_org, events_file)
         try:
-            with events_file.open("r", encoding="utf-8", newline="") as fh:
-                reader = csv.DictReader(fh)
-                rows = list(reader)
+            with events_file.open("r", encoding="utf-8", newline="", buffering=1 << 20) as fh:
+                # Plain csv.reader with column positions taken from the header -
+                # no per-row dict, and rows are validated as they stream off disk
+                reader = csv.reader(fh)
+                header = next(reader, [])
+                missing = _EXPECTED_FIELDS - set(header)
+                if missing:
+                    terminate(f"Events file is missing fields: {', '.join(sorted(missing))}")
+                columns = [header.index(field) for field in ("repo_org", "repo_name", "before", "timestamp")]
+                get_columns = operator.itemgetter(*columns)
+                return _gather_from_iter(input_org, (get_columns(row) for row in reader))
         except Exception as exc:
             terminate(f"Failed to parse events file {events_file}: {exc}")
-        return _gather_from_iter(input_org, rows)
 
     if db_file is None:
         terminate("You must supply --db-file or --events-file.")
@@ -328,35 +534,50 @@ def gather_commits(input_org: str, events_file: Optional[Path] | None = None,
         terminate(f"SQLite database not found: {db_file}")
 
     try:
-        with sqlite3.connect(db_file) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT repo_org, repo_name, before, timestamp FROM pushes WHERE repo_org = ?",
-                (input_org,),
-            )
-            rows = [dict(r) for r in cur.fetchall()]
+        # Read-only connection with memory-mapped pages and a large page cache. The
+        # query is served by idx_pushes_org_covering when the star counter's setup
+        # has built it, without touching the table pages
+        with closing(sqlite3.connect(db_file.resolve().as_uri() + "?mode=ro", uri=True)) as conn:
+            conn.executescript(_READONLY_PRAGMAS)
+
+            # Rows are plain tuples streamed straight off the cursor
+            repos = _gather_from_iter(input_org, conn.execute(_PUSHES_QUERY, (input_org,)))
     except Exception as exc:
         terminate(f"Failed querying SQLite DB {db_file}: {exc}")
 
-    return _gather_from_iter(input_org, rows)
+    return repos
+
+
+def _year_histogram(repos: Dict[str, RepoCommits], total_commits: int) -> Counter:
+    """Count force-push events per (integer) year."""
+    all_dates = itertools.chain.from_iterable(dates for _, dates in repos.values())
+    if np is None:
+        counter = Counter()
+        counter.update(map(year_of, all_dates))
+        return counter
+
+    # Vectorised: epoch seconds → calendar years in one pass, no datetime per event
+    timestamps = np.fromiter(all_dates, dtype=np.int64, count=total_commits)
+    years = timestamps.astype("datetime64[s]").astype("datetime64[Y]").astype(np.int64) + 1970
+    unique_years, counts = np.unique(years, return_counts=True)
+    return Counter(dict(zip(unique_years.tolist(), counts.tolist())))
 
 
-def report(input_org: str, repos: Dict[str, List[dict]]) -> None:
+def report(input_org: str, repos: Dict[str, RepoCommits]) -> None:
     repo_count = len(repos)
-    total_commits = sum(len(v) for v in repos.values())
+    total_commits = sum(len(befores) for befores, _ in repos.values())
 
     print(f"\n{Fore.CYAN}======= Force-Push Summary for {input_org} ======={Style.RESET_ALL}")
     print(f"{Fore.GREEN}Repos impacted : {repo_count}{Style.RESET_ALL}")
     print(f"{Fore.GREEN}Total commits  : {total_commits}{Style.RESET_ALL}\n")
 
-    for repo_url, commits in repos.items():
-        print(f"{Fore.YELLOW}{repo_url}{Style.RESET_ALL}: {len(commits)} commits")
+    for repo_url, (befores, _) in repos.items():
+        print(f"{Fore.YELLOW}{repo_url}{Style.RESET_ALL}: {len(befores)} commits")
     print()
 
-    counter = Counter(to_year(c["date"]) for commits in repos.values() for c in commits)
+    counter = _year_histogram(repos, total_commits)
     if counter:
-        first_year = int(min(counter))
+        first_year = min(counter)
     else:
         first_year = _dt.date.today().year
 
@@ -365,7 +586,7 @@ def report(input_org: str, repos: Dict[str, List[dict]]) -> None:
     print(f"{Fore.CYAN}Histogram:{Style.RESET_ALL}")
     for year in range(first_year, current_year + 1):
         year_key = f"{year:04d}"
-        count = counter.get(year_key, 0)
+        count = counter.get(year, 0)
         bar = "▇" * min(count, 40)
         if count > 0:
             print(f" {Fore.GREEN}{year_key}{Style.RESET_ALL} | {bar} {count}")
@@ -374,147 +595,283 @@ def report(input_org: str, repos: Dict[str, List[dict]]) -> None:
     print("=================================\n")
 
 
+def _git_meta(finding: dict) -> dict:
+    """Return the finding's SourceMetadata.Data.Git mapping (empty if absent)."""
+    return ((finding.get('SourceMetadata') or {}).get('Data') or {}).get('Git') or {}
+
+
 def _print_formatted_finding(finding: dict, repo_url: str) -> None:
     """Pretty-print a single TruffleHog *finding* for humans."""
-    print(f"{Fore.GREEN}")
-    print(f"✅ Found verified result 🐷🔑")
-    print(f"Detector Type: {finding.get('DetectorName', 'N/A')}")
-    print(f"Decoder Type: {finding.get('DecoderName', 'N/A')}")
-
     raw_val = finding.get('Raw') or finding.get('RawV2', '')
-    print(f"Raw result: {Style.RESET_ALL}{raw_val}{Fore.GREEN}")
-
-    print(f"Repository: {repo_url}.git")
-    print(f"Commit: {finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('commit')}")
-    print(f"Email: {finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('email') or 'unknown'}")
-    print(f"File: {finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('file')}")
-    print(f"Link: {repo_url}/commit/{finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('commit')}")
-    print(f"Timestamp: {finding.get('SourceMetadata', {}).get('Data', {}).get('Git', {}).get('timestamp')}")
+    git = _git_meta(finding)
+    lines = [
+        f"{Fore.GREEN}",
+        f"✅ Found verified result 🐷🔑",
+        f"Detector Type: {finding.get('DetectorName', 'N/A')}",
+        f"Decoder Type: {finding.get('DecoderName', 'N/A')}",
+        f"Raw result: {Style.RESET_ALL}{raw_val}{Fore.GREEN}",
+        f"Repository: {repo_url}.git",
+        f"Commit: {git.get('commit')}",
+        f"Email: {git.get('email') or 'unknown'}",
+        f"File: {git.get('file')}",
+        f"Link: {repo_url}/commit/{git.get('commit')}",
+        f"Timestamp: {git.get('timestamp')}",
+    ]
 
     extra = finding.get('ExtraData') or {}
     for k, v in extra.items():
         key_str = str(k).replace('_', ' ').title()
-        print(f"{key_str}: {v}")
-    print(f"{Style.RESET_ALL}")
+        lines.append(f"{key_str}: {v}")
+    lines.append(f"{Style.RESET_ALL}")
+
+    # One write per finding so concurrent workers never interleave their output
+    blob = "\n".join(lines) + "\n"
+    with _print_lock:
+        sys.stdout.write(blob)
+        sys.stdout.flush()
+
+
+# Git performance optimizations applied to every scan clone
+_GIT_CLONE_CONFIG = (
+    ("core.preloadindex", "true"),
+    ("core.fscache", "true"),
+    ("gc.auto", "0"),
+    ("fetch.parallel", "8"),
+)
 
+# History is fetched shallow and deepened only when the base commit is not found
+_INITIAL_FETCH_DEPTH = 50
+_MAX_FETCH_DEPTH = 800
 
-def identify_base_commit(repo_path: Path, since_commit: str) -> str:
-    """Identify the base commit for the given repository and since_commit."""
-    run(["git", "fetch", "origin", since_commit], cwd=repo_path)
-    output = run(["git", "rev-list", since_commit], cwd=repo_path)
 
-    for commit in output.splitlines():
-        commit = commit.strip('\n')
-        if run(["git", "branch", "--contains", commit, "--all"], cwd=repo_path):
-            if commit != since_commit:
-                return commit
+# SHAs per batched fetch - keeps the command line well under OS argument limits
+_FETCH_BATCH_SIZE = 256
+
+
+def prefetch_commits(repo_path: Path, commits: List[str]) -> set:
+    """
+    Fetch *commits* at the initial depth in as few `git fetch` round trips as
+    possible; returns the SHAs that were fetched. A batch that fails (e.g. one
+    SHA is no longer on the server) is left to the per-commit fetch.
+    """
+    fetched = set()
+    for i in range(0, len(commits), _FETCH_BATCH_SIZE):
+        batch = commits[i:i + _FETCH_BATCH_SIZE]
+        with suppress(RunCmdError):
+            run(["git", "fetch", "--no-tags", f"--depth={_INITIAL_FETCH_DEPTH}", "origin", *batch], cwd=repo_path)
+            fetched.update(batch)
+    return fetched
+
+
+def _locate_base(repo_path: Path, since_commit: str, fetched: bool = False) -> Tuple[str, set]:
+    """Return (base commit, commits between base and since_commit) for since_commit."""
+    depth = _INITIAL_FETCH_DEPTH
+    while True:
+        if not fetched:
+            run(["git", "fetch", "--no-tags", f"--depth={depth}", "origin", since_commit], cwd=repo_path)
+        fetched = False
+        # One walk over the commits not reachable from any branch; --boundary
+        # also lists the branch commits they were built on, prefixed with "-"
+        unreachable = set()
+        boundary = []
+        for line in run(
+            ["git", "rev-list", "--boundary", "--timestamp", since_commit, "--not", "--branches", "--remotes"],
+            cwd=repo_path,
+        ).splitlines():
+            timestamp, commit = line.split()
+            if commit[0] == "-":
+                boundary.append((int(timestamp), commit[1:]))
+            else:
+                unreachable.add(commit)
+
+        if not unreachable:
+            # since_commit is itself on a branch - scan just that commit
             try:
-                c = run(["git", "rev-list", commit + "~1", "-n", "1"], cwd=repo_path)
-                return c.strip('\n')
+                c = run(["git", "rev-list", since_commit + "~1", "-n", "1"], cwd=repo_path)
+                return c.strip('\n'), {since_commit}
             except RunCmdError:
-                return ""
-        continue
-    return ""
+                return "", {since_commit}
+
+        if boundary:
+            # The most recent branch commit is where the force-pushed history forked off
+            return max(boundary)[1], unreachable
+
+        if depth >= _MAX_FETCH_DEPTH:
+            return "", unreachable
 
+        # Base commit lies beyond the shallow boundary - deepen the branches too and retry
+        depth *= 2
+        with suppress(RunCmdError):
+            run(["git", "fetch", "--no-tags", f"--deepen={depth}", "origin"], cwd=repo_path)
 
-def write_finding_to_file(finding: dict, findings_file: Path) -> None:
-    """Thread-safe write of finding to JSON file."""
-    global _findings_count
 
-    with _file_lock:
+def _synthetic_merge(repo_path: Path, parents: List[str]) -> str:
+    """Create an unreferenced commit whose parents are *parents*, returning its SHA."""
+    cmd = ["git", "-c", "user.name=seraphix", "-c", "user.email=seraphix@localhost",
+           "commit-tree", parents[0] + "^{tree}", "-m", "seraphix scan range"]
+    for parent in parents:
+        cmd += ["-p", parent]
+    return run(cmd, cwd=repo_path).strip()
+
+
+def scan_ranges(repo_path: Path, ranges: Dict[str, Tuple[str, set]]) -> List[Tuple[str, str, set]]:
+    """
+    Group per-commit (base, commits) ranges into (branch, since_commit, tips) scans,
+    one per distinct base. TruffleHog walks from branch back to
+    merge-base(branch, since_commit) only, so ranges with different bases cannot
+    share a scan; tips sharing a base are joined under a synthetic merge commit.
+    Findings must be filtered afterwards.
+    """
+    by_base: Dict[str, List[str]] = defaultdict(list)
+    for tip, (base, _) in ranges.items():
+        by_base[base].append(tip)
+
+    scans = []
+    for base, tips in by_base.items():
+        if len(tips) == 1:
+            scans.append((tips[0], base, {tips[0]}))
+            continue
         try:
-            with open(findings_file, 'a', encoding='utf-8') as file:
-                if _findings_count > 0:
-                    file.write(',\n')
-                json.dump(finding, file, indent=2, ensure_ascii=False)
-            _findings_count += 1
-        except Exception as e:
-            print(f"    {Fore.RED}[✗] Failed to write finding to file: {e}{Style.RESET_ALL}")
+            scans.append((_synthetic_merge(repo_path, tips), base, set(tips)))
+        except RunCmdError:
+            # Fall back to one scan per commit range
+            scans.extend((tip, base, {tip}) for tip in tips)
+    return scans
+
+
+def write_findings_to_file(findings: List[dict], findings_fh, findings_count: int) -> int:
+    """Append a repository's *findings* to the open JSON array in one write; return the new total."""
+    chunk = b',\n'.join(map(_dumps, findings))
+    findings_fh.write(b',\n' + chunk if findings_count > 0 else chunk)
+    # Flush per repository so completed results survive an interrupted scan
+    findings_fh.flush()
+    return findings_count + len(findings)
+
 
+def scan_single_repo(repo_data: tuple[str, RepoCommits], org_name: str = None) -> tuple[str, int, List[dict]]:
+    """Scan a single repository for secrets. Returns (repo_url, commits_scanned, findings)."""
+    repo_url, (befores, dates) = repo_data
 
-def scan_single_repo(repo_data: tuple[str, List[dict]], findings_file: Path, org_name: str = None) -> tuple[str, int, int]:
-    """Scan a single repository for secrets. Returns (repo_url, commits_scanned, findings_count)."""
-    repo_url, commits = repo_data
+    # "before" SHAs are already unique per repo (see _gather_from_iter);
+    # newest first so the most recent force-push owns shared findings
+    commits = [before for before, _ in sorted(zip(befores, dates), key=lambda c: c[1], reverse=True)]
 
     commit_counter = 0
-    repo_findings = 0
+    repo_findings: List[dict] = []
     tmp_dir = tempfile.mkdtemp(prefix="gh-repo-")
 
     try:
         tmp_path = Path(tmp_dir)
 
-        # Git performance optimizations
-        git_config = [
-            ["git", "config", "core.preloadindex", "true"],
-            ["git", "config", "core.fscache", "true"],
-            ["git", "config", "gc.auto", "0"],
-            ["git", "config", "fetch.parallel", "8"],
-        ]
-
         try:
-            # Clone with optimizations
-            run([
-                "git", "clone",
+            # Clone with optimizations; the performance settings are written
+            # into the new repository's config by clone itself (-c) rather
+            # than by one `git config` process each
+            clone_cmd = ["git", "clone"]
+            for key, value in _GIT_CLONE_CONFIG:
+                clone_cmd += ["-c", f"{key}={value}"]
+            run(clone_cmd + [
                 "--filter=blob:none",
+                # No working tree or index, so this is as small as a bare clone
+                # while keeping the refs/remotes/* the base lookup excludes
                 "--no-checkout",
-                "--depth=100",  # Limit depth for faster clones
+                "--no-tags",
+                f"--depth={_INITIAL_FETCH_DEPTH}",  # Deepened on demand by _locate_base
                 repo_url + ".git", "."
             ], cwd=tmp_path)
 
-            # Apply git optimizations
-            for config_cmd in git_config:
-                try:
-                    run(config_cmd, cwd=tmp_path)
-                except RunCmdError:
-                    pass  # Continue if config fails
-
         except RunCmdError as err:
-            return repo_url, 0, 0
+            return repo_url, 0, []
 
-        for c in commits:
-            before = c["before"]
-            if not _SHA_RE.fullmatch(before):
-                continue
+        # Resolve every commit's range first so TruffleHog runs once per distinct base
+        ranges: Dict[str, Tuple[str, set]] = {}
+        # One network round trip for all commits instead of one fetch each
+        prefetched = prefetch_commits(tmp_path, commits)
 
+        # Every "before" was validated as a SHA when the events were gathered
+        for before in commits:
             commit_counter += 1
 
             try:
-                since_commit = identify_base_commit(tmp_path, before)
+                ranges[before] = _locate_base(tmp_path, before, fetched=before in prefetched)
             except RunCmdError as err:
                 if "fatal: remote error: upload-pack: not our ref" in str(err):
                     continue
                 else:
                     break
 
-            findings = scan_with_trufflehog(tmp_path, since_commit=since_commit, branch=before, commits=commits)
+        if not ranges:
+            return repo_url, commit_counter, repo_findings
+
+        # Findings are attributed to the newest force-pushed commit whose range contains them
+        owners: Dict[str, str] = {}
+        for before, (_, owned) in ranges.items():
+            for commit in owned:
+                owners.setdefault(commit, before)
+
+        scans = scan_ranges(tmp_path, ranges)
+
+        # Measured once per clone, after the base lookups have fetched what the scan needs
+        size_mb = measure_repo_size_mb(tmp_path)
+
+        for branch, since_commit, tips in scans:
+            findings = scan_with_trufflehog(tmp_path, since_commit=since_commit, branch=branch,
+                                            commits=commits, repo_size_mb=size_mb)
+
+            for f in findings:
+                # A commit reachable from several scans is reported by its owner's scan only
+                before = owners.get(_git_meta(f).get('commit'))
+                if before not in tips:
+                    continue
+
+                f['repository_url'] = repo_url
+                f['scanned_commit'] = before
+                f['scan_timestamp'] = _dt.datetime.now().isoformat()
 
-            if findings:
-                for f in findings:
-                    f['repository_url'] = repo_url
-                    f['scanned_commit'] = before
-                    f['scan_timestamp'] = _dt.datetime.now().isoformat()
+                repo_findings.append(f)
+                _print_formatted_finding(f, repo_url)
 
-                    write_finding_to_file(f, findings_file)
-                    repo_findings += 1
-                    _print_formatted_finding(f, repo_url)
-                    
-                    # Send immediate notification
-                    if org_name:
-                        send_immediate_notification(f, repo_url, org_name)
+                # Send immediate notification
+                if org_name:
+                    send_immediate_notification(f, repo_url, org_name)
 
     finally:
-        # Simple cleanup - don't fail if we can't clean up immediately
-        # Full cleanup will happen at beginning/end of script execution
+        # Deletion happens on the janitor thread so this worker can move on to
+        # the next repository; leftovers are caught by the batch cleanup
+        _discard_tree(tmp_dir)
+
+    return repo_url, commit_counter, repo_findings
+
+
+# Background deletion of finished clones, off the scan workers' critical path
+_janitor_queue: "queue.Queue[str]" = queue.Queue()
+_janitor_lock = threading.Lock()
+_janitor_thread: Optional[threading.Thread] = None
+
+
+def _janitor() -> None:
+    while True:
+        path = _janitor_queue.get()
         try:
-            if os.path.exists(tmp_dir):
-                shutil.rmtree(tmp_dir, ignore_errors=True)
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
                 if logging.getLogger().isEnabledFor(logging.DEBUG):
-                    print(f"🧹 Cleaned up temporary repository: {tmp_dir}")
+                    print(f"🧹 Cleaned up temporary repository: {path}")
         except Exception:
             # Ignore cleanup failures - batch cleanup will handle it later
             pass
+        finally:
+            _janitor_queue.task_done()
 
-    return repo_url, commit_counter, repo_findings
+
+def _discard_tree(path: str) -> None:
+    """Queue *path* for removal by the janitor thread, starting it on first use."""
+    global _janitor_thread
+    with _janitor_lock:
+        if _janitor_thread is None:
+            _janitor_thread = threading.Thread(target=_janitor, name="clone-janitor", daemon=True)
+            _janitor_thread.start()
+    _janitor_queue.put(path)
 
 
 def cleanup_temp_directories(prefix: str = "gh-repo-") -> None:
@@ -545,11 +902,14 @@ def cleanup_temp_directories(prefix: str = "gh-repo-") -> None:
         print(f"🧹 Cleaned up {cleaned_count} temporary directories")
 
 
-def scan_commits(repo_user: str, repos: Dict[str, List[dict]], max_workers: int = 16, results_dir: Path = None) -> None:
-    """Scan commits in parallel using ThreadPoolExecutor."""
-    global _findings_count
-    _findings_count = 0
-    
+def scan_commits(repo_user: str, repos: Dict[str, RepoCommits], max_workers: int = 16, results_dir: Path = None) -> None:
+    """
+    Scan commits in parallel using ThreadPoolExecutor.
+
+    Workers spend nearly all their time blocked on git and TruffleHog, which
+    release the GIL, and first-secret notifications are de-duplicated through
+    in-process state - so threads are used rather than worker processes.
+    """
     # Reset notification tracking for this new scan
     reset_notification_tracking()
 
@@ -560,10 +920,11 @@ def scan_commits(repo_user: str, repos: Dict[str, List[dict]], max_workers: int
     else:
         findings_file = Path(f"verified_secrets_{repo_user}.json")
 
-    # Initialize the JSON file
+    # Initialize the JSON file - it stays open for the whole scan and only the
+    # writer thread below touches it, one buffered write per repository
     try:
-        with open(findings_file, 'w', encoding='utf-8') as f:
-            f.write('[\n')
+        findings_fh = open(findings_file, 'wb', buffering=1 << 20)
+        findings_fh.write(b'[\n')
     except Exception as e:
         print(f"{Fore.RED}[✗] Failed to create findings file {findings_file}: {e}{Style.RESET_ALL}")
         return
@@ -574,43 +935,72 @@ def scan_commits(repo_user: str, repos: Dict[str, List[dict]], max_workers: int
     total_repos = len(repos)
     total_commits_scanned = 0
     completed_repos = 0
+    findings_count = 0
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all repository scan tasks
-        future_to_repo = {
-            executor.submit(scan_single_repo, (repo_url, commits), findings_file, repo_user): repo_url
-            for repo_url, commits in repos.items()
-        }
+    # Disk writes happen off the collecting loop so progress is never held up by I/O
+    pending_findings: "queue.Queue[Optional[List[dict]]]" = queue.Queue()
 
-        # Process completed tasks
-        for future in concurrent.futures.as_completed(future_to_repo):
-            repo_url = future_to_repo[future]
+    def _drain_findings() -> None:
+        nonlocal findings_count
+        while (repo_findings := pending_findings.get()) is not None:
             try:
-                _, commits_scanned, repo_findings = future.result()
-                total_commits_scanned += commits_scanned
-                completed_repos += 1
+                findings_count = write_findings_to_file(repo_findings, findings_fh, findings_count)
+            except Exception as e:
+                print(f"    {Fore.RED}[✗] Failed to write findings to file: {e}{Style.RESET_ALL}")
 
-                if completed_repos % 10 == 0 or completed_repos == total_repos:
-                    elapsed = time.time() - start_time
-                    print(f"    {Fore.BLUE}[Progress] {completed_repos}/{total_repos} repos completed in {elapsed:.1f}s{Style.RESET_ALL}")
+    writer = threading.Thread(target=_drain_findings, name="findings-writer", daemon=True)
+    writer.start()
 
-            except Exception as exc:
-                print(f"{Fore.RED}[✗] Repository {repo_url} generated an exception: {exc}{Style.RESET_ALL}")
-
-    # Close the JSON array
     try:
-        with open(findings_file, 'a', encoding='utf-8') as f:
-            f.write('\n]')
-    except Exception as e:
-        print(f"{Fore.RED}[✗] Failed to close JSON array in {findings_file}: {e}{Style.RESET_ALL}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Submit all repository scan tasks, largest first: the pool queue is FIFO,
+            # so a repo with hundreds of commits starts early instead of becoming the
+            # straggler every other worker waits on at the end
+            by_size = sorted(repos.items(), key=lambda item: len(item[1][0]), reverse=True)
+            future_to_repo = {
+                executor.submit(scan_single_repo, (repo_url, commits), repo_user): repo_url
+                for repo_url, commits in by_size
+            }
+
+            # Process completed tasks
+            for future in concurrent.futures.as_completed(future_to_repo):
+                repo_url = future_to_repo[future]
+                try:
+                    _, commits_scanned, repo_findings = future.result()
+                    total_commits_scanned += commits_scanned
+                    completed_repos += 1
+
+                    if repo_findings:
+                        pending_findings.put(repo_findings)
+
+                    if completed_repos % 10 == 0 or completed_repos == total_repos:
+                        elapsed = time.time() - start_time
+                        print(f"    {Fore.BLUE}[Progress] {completed_repos}/{total_repos} repos completed in {elapsed:.1f}s{Style.RESET_ALL}")
+
+                except Exception as exc:
+                    print(f"{Fore.RED}[✗] Repository {repo_url} generated an exception: {exc}{Style.RESET_ALL}")
+    finally:
+        # Let the writer flush everything queued before the array is closed
+        pending_findings.put(None)
+        writer.join()
+
+        # Don't leave this scan's clones behind for the next one
+        _janitor_queue.join()
+
+        # Close the JSON array
+        try:
+            with findings_fh:
+                findings_fh.write(b'\n]')
+        except Exception as e:
+            print(f"{Fore.RED}[✗] Failed to close JSON array in {findings_file}: {e}{Style.RESET_ALL}")
 
     elapsed = time.time() - start_time
     print(f"\n{Fore.GREEN}[✓] Scan for {repo_user} completed in {elapsed:.1f} seconds{Style.RESET_ALL}")
     print(f"{Fore.GREEN}[✓] {total_repos} repositories processed{Style.RESET_ALL}")
     print(f"{Fore.GREEN}[✓] {total_commits_scanned} total commits scanned{Style.RESET_ALL}")
 
-    if _findings_count > 0:
-        print(f"{Fore.GREEN}[✓] {_findings_count} verified secrets saved to {findings_file}{Style.RESET_ALL}")
+    if findings_count > 0:
+        print(f"{Fore.GREEN}[✓] {findings_count} verified secrets saved to {findings_file}{Style.RESET_ALL}")
     else:
         print(f"{Fore.YELLOW}[i] No verified secrets found for {repo_user}{Style.RESET_ALL}")
         try:
@@ -87,12 +87,12 @@ install_python_deps() {
     log_info "Using Python: $($PYTHON_CMD --version)"
     
     # Install required packages
-    log_progress "Installing Python packages (requests, colorama)..."
-    if $PYTHON_CMD -m pip install --upgrade pip requests colorama; then
+    log_progress "Installing Python packages (requests, colorama, orjson, ijson)..."
+    if $PYTHON_CMD -m pip install --upgrade pip requests colorama orjson ijson; then
         log_success "Python dependencies installed successfully"
     else
         log_warning "Failed to install Python packages. Python utilities may not work."
-        log_info "You can manually install with: $PYTHON_CMD -m pip install requests colorama"
+        log_info "You can manually install with: $PYTHON_CMD -m pip install requests colorama orjson ijson"
     fi
 }
 
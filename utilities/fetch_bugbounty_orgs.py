@@ -7,19 +7,62 @@ which maintains a mapping from bug bounty programs to GitHub organizations.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import heapq
 import re
 import sys
 import os
 import json
 from urllib.parse import urlparse
-from typing import List, Set, Dict, Optional
+from typing import Iterable, Iterator, List, Set, Dict, Optional
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Fast JSON support (optional): orjson parses/serializes in C, stdlib json is the fallback
+try:
+    import orjson
+    _JSONDecodeError = orjson.JSONDecodeError
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    _JSONDecodeError = json.JSONDecodeError
+
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode('utf-8')
+
+# Org name from URLs like https://github.com/microsoft or https://github.com/microsoft/repo
+_GITHUB_URL_RE = re.compile(r'github\.com/([^/\s]+)')
+_GITHUB_URL_PREFIX = 'https://github.com/'
+# Paths that look like orgs but aren't real orgs
+_SKIP_ORGS = frozenset({'settings', 'notifications', 'search'})
+# Parallel raw file downloads (CDN-served, not subject to the REST API rate limit)
+TSV_DOWNLOAD_WORKERS = 8
+
+def _org_from_github_url(github_entry: str) -> Optional[str]:
+    """Return the org segment of a GitHub URL, or None if there isn't one"""
+    if github_entry.startswith(_GITHUB_URL_PREFIX):
+        # Fast path for the common canonical form - plain string ops, no regex
+        tail = github_entry[len(_GITHUB_URL_PREFIX):]
+        if tail and tail[0] != '/' and not tail[0].isspace():
+            return tail.split('/', 1)[0].split(None, 1)[0]
+    match = _GITHUB_URL_RE.search(github_entry)
+    return match.group(1) if match else None
 
 class BugBountyOrgsFetcher:
     def __init__(self, github_token: Optional[str] = None):
         self.github_token = github_token
         self.session = requests.Session()
+        # Keep-alive connection pool shared by the API and raw file downloads
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+        self.session.mount("https://", adapter)
         if github_token:
             self.session.headers.update({'Authorization': f'token {github_token}'})
         
@@ -59,92 +102,83 @@ class BugBountyOrgsFetcher:
         try:
             response = self.make_request(url)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return _loads(response.content)
+        except (requests.exceptions.RequestException, _JSONDecodeError) as e:
             print(f"❌ Error fetching directory contents: {e}")
             return []
     
-    def fetch_tsv_file(self, file_path: str) -> str:
-        """Fetch TSV file content from raw GitHub"""
+    def fetch_tsv_file(self, file_path: str) -> Iterator[bytes]:
+        """Stream raw TSV file lines from raw GitHub without buffering the whole file"""
         url = f"{self.raw_base_url}/{file_path}"
         
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.text
+            with self.session.get(url, stream=True) as response:
+                response.raise_for_status()
+                yield from response.iter_lines()
         except requests.exceptions.RequestException as e:
             print(f"❌ Error fetching {file_path}: {e}")
-            return ""
     
-    def extract_github_orgs_from_tsv(self, content: str) -> Set[str]:
-        """Extract GitHub organization names from TSV content"""
-        orgs = set()
+    def extract_github_orgs_from_tsv(self, lines: Iterable[bytes]) -> Set[str]:
+        """Extract GitHub organization names from raw TSV lines"""
+        # Names are collected in a list and deduplicated once at the end
+        org_names = []
         
-        for line in content.strip().split('\n'):
-            if not line.strip() or line.startswith('#'):
+        # TSV format: URL \t GitHub_org_or_status. Lines stay bytes; only the
+        # GitHub column of lines that can hold an org is ever decoded
+        for line in lines:
+            # Skips comments, blanks and '?'/'-' entries in one cheap test
+            if b'github.com/' not in line or line.startswith(b'#'):
                 continue
             
-            # TSV format: URL \t GitHub_org_or_status
-            parts = line.split('\t')
+            parts = line.split(b'\t', 2)
             if len(parts) >= 2:
                 github_entry = parts[1].strip()
                 
-                # Skip entries that are not GitHub URLs
-                if github_entry in ['?', '-'] or not github_entry:
-                    continue
-                
                 # Extract org name from GitHub URL
-                if 'github.com/' in github_entry:
-                    # Extract organization name from URLs like:
-                    # https://github.com/microsoft
-                    # https://github.com/microsoft/repo
-                    match = re.search(r'github\.com/([^/\s]+)', github_entry)
-                    if match:
-                        org_name = match.group(1)
-                        # Skip user accounts that look like orgs but aren't real orgs
-                        if org_name and org_name not in ['settings', 'notifications', 'search']:
-                            orgs.add(org_name)
+                if b'github.com/' in github_entry:
+                    org_name = _org_from_github_url(github_entry.decode('utf-8', 'replace'))
+                    if org_name and org_name not in _SKIP_ORGS:
+                        org_names.append(org_name)
         
-        return orgs
+        return set(org_names)
+    
+    def fetch_orgs_from_tsv_file(self, file_path: str) -> Set[str]:
+        """Download one TSV file and extract its GitHub organizations"""
+        return self.extract_github_orgs_from_tsv(self.fetch_tsv_file(file_path))
     
     def fetch_all_orgs(self) -> Set[str]:
         """Fetch all bug bounty GitHub organizations"""
         print("🔍 Fetching bug bounty organizations from nikitastupin/orgs-data...")
         
-        all_orgs = set()
-        
         # Get directory contents
         contents = self.get_directory_contents("orgs-data")
         if not contents:
             print("❌ Could not fetch directory contents")
-            return all_orgs
+            return set()
         
         tsv_files = [item for item in contents if item['name'].endswith('.tsv')]
         
         print(f"📁 Found {len(tsv_files)} TSV files to process")
         
-        for file_info in tsv_files:
-            file_name = file_info['name']
-            file_path = f"orgs-data/{file_name}"
-            
-            print(f"📄 Processing {file_name}...")
-            
-            content = self.fetch_tsv_file(file_path)
-            if content:
-                file_orgs = self.extract_github_orgs_from_tsv(content)
-                print(f"   Found {len(file_orgs)} organizations")
-                all_orgs.update(file_orgs)
-            
-            # Small delay to be respectful
-            time.sleep(0.1)
+        file_paths = [f"orgs-data/{file_info['name']}" for file_info in tsv_files]
+        per_file_orgs = []
+        
+        # Downloads are independent and I/O-bound; results come back in file order
+        with ThreadPoolExecutor(max_workers=TSV_DOWNLOAD_WORKERS) as executor:
+            for file_info, file_orgs in zip(tsv_files, executor.map(self.fetch_orgs_from_tsv_file, file_paths)):
+                print(f"📄 Processed {file_info['name']}")
+                if file_orgs:
+                    print(f"   Found {len(file_orgs)} organizations")
+                    per_file_orgs.append(file_orgs)
         
-        return all_orgs
+        # Merge every file's set in one C-level union
+        return set().union(*per_file_orgs)
     
     def save_orgs_to_file(self, orgs: Set[str], output_file: str):
         """Save organizations to a file"""
-        with open(output_file, 'w') as f:
-            for org in sorted(orgs):
-                f.write(f"{org}\n")
+        # One buffered write stream instead of a write() call per org
+        with open(output_file, 'w', buffering=1 << 20) as f:
+            f.writelines(f"{org}\n" for org in sorted(orgs))
         print(f"💾 Saved {len(orgs)} organizations to {output_file}")
     
     def save_orgs_to_json(self, orgs: Set[str], output_file: str):
@@ -153,11 +187,11 @@ class BugBountyOrgsFetcher:
             "source": "nikitastupin/orgs-data",
             "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime()),
             "total_orgs": len(orgs),
-            "organizations": sorted(list(orgs))
+            "organizations": sorted(orgs)
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        with open(output_file, 'wb') as f:
+            f.write(_dumps(data))
         print(f"💾 Saved {len(orgs)} organizations to {output_file}")
 
 def main():
@@ -200,7 +234,7 @@ def main():
     
     # Print some example organizations
     print("\n📋 Sample organizations found:")
-    sample_orgs = sorted(list(orgs))[:10]
+    sample_orgs = heapq.nsmallest(10, orgs)
     for org in sample_orgs:
         print(f"   • {org}")
     
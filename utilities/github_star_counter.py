@@ -8,25 +8,69 @@ fetches their GitHub star counts, and updates the database with star information
 
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import sys
 import os
 import time
 import argparse
-from collections import defaultdict
-from typing import Dict, List, Tuple, Optional
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+
+# Fast JSON support (optional): orjson parses/serializes in C, stdlib json is the fallback
+try:
+    import orjson
+    _JSONDecodeError = orjson.JSONDecodeError
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    _JSONDecodeError = json.JSONDecodeError
+
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
 
 # Configuration
 DEFAULT_DB_FILE = "force_push_commits.sqlite3"
 GITHUB_TOKEN = None  # Set this or use environment variable GITHUB_TOKEN
-RATE_LIMIT_DELAY = 1  # Seconds between API calls
 BATCH_SIZE = 50  # Number of repos to process before committing to database
+RATE_LIMIT_RETRIES = 3  # Retries of a rate-limited request before giving up on it
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 100  # Repositories looked up per GraphQL request
+GRAPHQL_CONCURRENCY = 4  # GraphQL batches in flight at once
+REPO_PAGE_SIZE = 1000  # Repositories read from the database per query
+STARS_CACHE_TTL = 7 * 24 * 3600  # Seconds a stored star count is trusted without asking GitHub
 
 class GitHubStarCounter:
     def __init__(self, github_token: Optional[str] = None, db_file: str = DEFAULT_DB_FILE):
         self.github_token = github_token or os.environ.get('GITHUB_TOKEN')
         self.db_file = db_file
         self.session = requests.Session()
+        # Keep-alive pool sized for the concurrent GraphQL batches. Plain HTTP/1.1 is
+        # enough here: with only GRAPHQL_CONCURRENCY requests in flight, each on its
+        # own reused connection, HTTP/2 multiplexing would save nothing but a few
+        # TLS handshakes per run. Transient errors
+        # and 429s are retried with exponential backoff, honouring Retry-After;
+        # rate-limit 403s are handled explicitly since other 403s are permanent
+        retries = Retry(
+            total=5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            backoff_factor=2,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=retries)
+        self.session.mount("https://", adapter)
         if self.github_token:
             self.session.headers.update({
                 'Authorization': f'token {self.github_token}',
@@ -34,8 +78,10 @@ class GitHubStarCounter:
             })
         
         self.repo_cache = {}  # Cache for individual repo data
+        self.db = None  # Long-lived connection for star/ETag writes, opened on first use
         self.processed_count = 0
         self.error_count = 0
+        self.stats_lock = threading.Lock()  # error_count is updated from lookup threads
         
         # Check initial rate limit status
         self.check_initial_rate_limit()
@@ -46,7 +92,7 @@ class GitHubStarCounter:
             if self.github_token:
                 response = self.session.get("https://api.github.com/rate_limit")
                 if response.status_code == 200:
-                    rate_data = response.json()
+                    rate_data = _loads(response.content)
                     core = rate_data.get('resources', {}).get('core', {})
                     limit = core.get('limit', 0)
                     remaining = core.get('remaining', 0)
@@ -72,8 +118,12 @@ class GitHubStarCounter:
     
     def setup_database(self):
         """Add the stars column to the database if it doesn't exist."""
+        db = self.get_db()
+        if db is None:
+            print(f"❌ Database setup error: {self.db_file} not available")
+            sys.exit(1)
+        
         try:
-            db = sqlite3.connect(self.db_file)
             cur = db.cursor()
             
             # Check if stars column exists
@@ -83,58 +133,170 @@ class GitHubStarCounter:
             if 'stars' not in columns:
                 print("Adding 'stars' column to database...")
                 cur.execute("ALTER TABLE pushes ADD COLUMN stars INTEGER DEFAULT NULL")
-                db.commit()
                 print("✓ Stars column added successfully")
             else:
                 print("✓ Stars column already exists")
             
-            # Create index for better query performance
-            try:
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_stars ON pushes(stars)")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_repo_org_name ON pushes(repo_org, repo_name)")
-                db.commit()
-                print("✓ Database indexes created")
-            except sqlite3.Error as e:
-                print(f"Note: Index creation warning: {e}")
-            
-            db.close()
+            # Create index for better query performance. A failure is fatal: the pending
+            # repo queries are pinned to idx_null_stars
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_stars ON pushes(stars)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_repo_org_name ON pushes(repo_org, repo_name)")
+            # Covering index for the force-push scanner's per-org lookup, which opens
+            # this database read-only and so cannot build it itself
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pushes_org_covering
+                ON pushes(repo_org, repo_name, before, timestamp)
+            """)
+            # Partial index holding only the repos still waiting for a star count,
+            # so finding pending work costs O(pending) instead of O(pushes)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_null_stars ON pushes(repo_org, repo_name)
+                WHERE stars IS NULL
+            """)
+            # Give the planner column statistics (sampled, so it stays quick on big tables)
+            cur.execute("PRAGMA analysis_limit=1000")
+            cur.execute("ANALYZE")
+            print("✓ Database indexes created")
             
         except sqlite3.Error as e:
             print(f"❌ Database setup error: {e}")
             sys.exit(1)
     
-    def get_repo_stars(self, org_name: str, repo_name: str) -> Optional[int]:
-        """Get star count for a specific repository."""
+    def get_db(self) -> Optional[sqlite3.Connection]:
+        """Open (once) the shared database connection, if the database exists."""
+        if self.db is None and os.path.exists(self.db_file):
+            try:
+                # Autocommit mode - batches are wrapped in explicit transactions
+                self.db = sqlite3.connect(self.db_file, isolation_level=None)
+                # Fewer fsyncs per commit; losing the last batch on power loss is harmless
+                # since its repos keep NULL stars and are picked up on the next run
+                self.db.execute("PRAGMA synchronous=NORMAL")
+                self.db.execute("PRAGMA temp_store=MEMORY")
+                # 64 MB page cache and memory-mapped reads for the scans over pushes
+                self.db.execute("PRAGMA cache_size=-65536")
+                self.db.execute("PRAGMA mmap_size=268435456")
+                self.db.execute("""
+                    CREATE TABLE IF NOT EXISTS repo_meta (
+                        repo_org TEXT NOT NULL,
+                        repo_name TEXT NOT NULL,
+                        etag TEXT,
+                        stars INTEGER,
+                        last_checked INTEGER,
+                        PRIMARY KEY (repo_org, repo_name)
+                    )
+                """)
+                # Tables created before last_checked existed
+                columns = {row[1] for row in self.db.execute("PRAGMA table_info(repo_meta)")}
+                if 'last_checked' not in columns:
+                    self.db.execute("ALTER TABLE repo_meta ADD COLUMN last_checked INTEGER")
+                # Batch updates join against this index - make sure it exists
+                self.db.execute("CREATE INDEX IF NOT EXISTS idx_repo_org_name ON pushes(repo_org, repo_name)")
+                # Per-connection staging table for batched star updates
+                self.db.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS star_updates (
+                        org TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        stars INTEGER,
+                        PRIMARY KEY (org, name)
+                    )
+                """)
+            except sqlite3.Error as e:
+                print(f"⚠️  Database connection unavailable: {e}")
+                self.db = None
+        return self.db
+    
+    def close(self):
+        """Close the shared database connection."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+    
+    def get_cached_etag(self, org_name: str, repo_name: str) -> Optional[Tuple[str, int]]:
+        """Return the stored (etag, stars) for a repository, if any."""
+        db = self.get_db()
+        if db is None:
+            return None
+        try:
+            row = db.execute(
+                "SELECT etag, stars FROM repo_meta WHERE repo_org = ? AND repo_name = ? AND etag IS NOT NULL",
+                (org_name, repo_name)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row
+    
+    def get_fresh_stars(self, org_name: str, repo_name: str) -> Optional[int]:
+        """Return the stored star count if it was checked within STARS_CACHE_TTL."""
+        db = self.get_db()
+        if db is None:
+            return None
+        try:
+            row = db.execute(
+                "SELECT stars FROM repo_meta WHERE repo_org = ? AND repo_name = ? AND last_checked >= ?",
+                (org_name, repo_name, int(time.time()) - STARS_CACHE_TTL)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+    
+    def store_repo_meta(self, rows: List[Tuple[str, str, Optional[str], int]]):
+        """
+        Remember (org, repo, etag, stars) of successful lookups, stamped with the
+        current time so later runs can skip them. A missing ETag keeps the stored one.
+        """
+        db = self.get_db()
+        if db is None or not rows:
+            return
+        now = int(time.time())
+        try:
+            db.execute("BEGIN")
+            db.executemany("""
+                INSERT INTO repo_meta (repo_org, repo_name, etag, stars, last_checked)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (repo_org, repo_name) DO UPDATE SET
+                    etag = COALESCE(excluded.etag, etag),
+                    stars = excluded.stars,
+                    last_checked = excluded.last_checked
+            """, [(org, repo, etag, stars, now) for org, repo, etag, stars in rows])
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            print(f"⚠️  Could not store repository metadata: {e}")
+    
+    def get_repo_stars(self, org_name: str, repo_name: str, use_cache: bool = True) -> Optional[int]:
+        """
+        Get star count for a specific repository. With use_cache=False the API is
+        always asked and nothing is stored in repo_meta (used to test API access).
+        """
         repo_key = f"{org_name}/{repo_name}"
         
-        if repo_key in self.repo_cache:
-            return self.repo_cache[repo_key]
+        if use_cache:
+            if repo_key in self.repo_cache:
+                return self.repo_cache[repo_key]
+            
+            # Checked recently (e.g. by an interrupted earlier run) - no API call needed
+            fresh = self.get_fresh_stars(org_name, repo_name)
+            if fresh is not None:
+                self.repo_cache[repo_key] = fresh
+                return fresh
         
         url = f"https://api.github.com/repos/{org_name}/{repo_name}"
         
         try:
-            # Check current rate limit status first
-            if self.github_token:
-                rate_limit_url = "https://api.github.com/rate_limit"
-                rate_check = self.session.get(rate_limit_url)
-                if rate_check.status_code == 200:
-                    rate_data = rate_check.json()
-                    core_limit = rate_data.get('resources', {}).get('core', {})
-                    remaining = core_limit.get('remaining', 0)
-                    reset_time = core_limit.get('reset', 0)
-                    
-                    if remaining <= 1:
-                        current_time = int(time.time())
-                        sleep_time = max(reset_time - current_time + 5, 60)
-                        print(f"⏳ Preemptive rate limit wait. Sleeping for {sleep_time} seconds...")
-                        print(f"   Rate limit resets at: {time.ctime(reset_time)}")
-                        time.sleep(sleep_time)
+            # Conditional request: an unchanged repository answers 304 with no body,
+            # which does not count against the rate limit
+            cached = self.get_cached_etag(org_name, repo_name) if use_cache else None
+            headers = {'If-None-Match': cached[0]} if cached else None
             
             # Make the actual API request
-            response = self.session.get(url)
+            response = self.session.get(url, headers=headers)
             
-            # Debug: Show response headers for troubleshooting
-            if response.status_code == 403:
+            for attempt in range(RATE_LIMIT_RETRIES):
+                if response.status_code != 403:
+                    break
+                
+                # Debug: Show response headers for troubleshooting
                 print(f"🐛 Debug - 403 response for {repo_key}:")
                 print(f"   X-RateLimit-Remaining: {response.headers.get('x-ratelimit-remaining', 'Not set')}")
                 print(f"   X-RateLimit-Reset: {response.headers.get('x-ratelimit-reset', 'Not set')}")
@@ -142,29 +304,27 @@ class GitHubStarCounter:
                 print(f"   Response: {response.text[:200]}...")
                 
                 # Check if it's actually a rate limit or different 403 error
-                if 'rate limit' in response.text.lower() or response.headers.get('x-ratelimit-remaining') == '0':
-                    # Rate limit hit
-                    reset_time_header = response.headers.get('x-ratelimit-reset')
-                    if reset_time_header and reset_time_header.isdigit():
-                        reset_time = int(reset_time_header)
-                        current_time = int(time.time())
-                        sleep_time = max(reset_time - current_time + 5, 60)
-                        print(f"⏳ Rate limit hit. Sleeping for {sleep_time} seconds...")
-                        print(f"   Current time: {time.ctime(current_time)}")
-                        print(f"   Reset time: {time.ctime(reset_time)}")
-                        time.sleep(sleep_time)
-                        # Retry the request
-                        response = self.session.get(url)
-                    else:
-                        print("⚠️  Rate limit detected but no valid reset time in headers")
-                        print("   Sleeping for 60 seconds as fallback...")
-                        time.sleep(60)
-                        response = self.session.get(url)
-                else:
+                if not self.is_rate_limited(response):
                     # Different kind of 403 error (e.g., private repo, insufficient permissions)
                     print(f"  ❌ 403 Forbidden (not rate limit) for {repo_key}")
                     self.repo_cache[repo_key] = 0
                     return 0
+                
+                # Rate limit hit - wait as long as GitHub asks, then retry
+                sleep_time = self.rate_limit_sleep_time(response, attempt)
+                print(f"⏳ Rate limit hit. Sleeping for {sleep_time} seconds (retry {attempt + 1}/{RATE_LIMIT_RETRIES})...")
+                time.sleep(sleep_time)
+                response = self.session.get(url, headers=headers)
+            
+            # Checked after the retries too: a retried request still sends If-None-Match
+            if response.status_code == 304 and cached:
+                self.repo_cache[repo_key] = cached[1]
+                self.store_repo_meta([(org_name, repo_name, cached[0], cached[1])])
+                return cached[1]
+            
+            # The rate limit is read from this response's headers rather than
+            # from a separate /rate_limit request before every call
+            self.wait_for_rate_limit(response)
             
             if response.status_code == 404:
                 # Repository not found or private
@@ -175,143 +335,354 @@ class GitHubStarCounter:
                 self.error_count += 1
                 return None
             
-            data = response.json()
+            data = _loads(response.content)
             stars = data.get('stargazers_count', 0)
             self.repo_cache[repo_key] = stars
-            
-            # Be nice to GitHub's API
-            time.sleep(RATE_LIMIT_DELAY)
+            if use_cache:
+                self.store_repo_meta([(org_name, repo_name, response.headers.get('ETag'), stars)])
             
             return stars
             
-        except requests.RequestException as e:
+        except (requests.RequestException, _JSONDecodeError) as e:
             print(f"  ❌ Request error for {repo_key}: {e}")
             self.error_count += 1
             return None
     
+    def is_rate_limited(self, response: requests.Response) -> bool:
+        """
+        Whether *response* was refused by a primary or secondary rate limit, as
+        opposed to a permanent error such as a 403 for a missing scope or SAML.
+        """
+        if response.status_code == 429:
+            return True
+        if response.status_code == 403:
+            # Header first; the body is only searched as raw bytes, never decoded to text
+            return (response.headers.get('x-ratelimit-remaining') == '0'
+                    or 'retry-after' in response.headers
+                    or response.content.find(b'rate limit') >= 0)
+        if response.status_code == 200 and response.content.find(b'RATE_LIMITED') >= 0:
+            # GraphQL reports an exhausted budget in the errors of a 200 response
+            try:
+                errors = _loads(response.content).get('errors') or []
+            except _JSONDecodeError:
+                return False
+            return any(error.get('type') == 'RATE_LIMITED' for error in errors)
+        return False
+    
+    def rate_limit_sleep_time(self, response: requests.Response, attempt: int = 0) -> int:
+        """
+        Seconds to wait after a rate-limited response: Retry-After (secondary
+        limits) if given, else until the primary limit resets. Waits that are not
+        tied to the reset time double with each retry *attempt*.
+        """
+        retry_after = response.headers.get('retry-after')
+        if retry_after and retry_after.isdigit():
+            return int(retry_after) * 2 ** attempt
+        reset_header = response.headers.get('x-ratelimit-reset')
+        if reset_header and reset_header.isdigit():
+            reset_time = int(reset_header)
+            print(f"   Rate limit resets at: {time.ctime(reset_time)}")
+            return max(reset_time - int(time.time()) + 5, 60)
+        print("⚠️  Rate limit detected but no valid reset time in headers")
+        return 60 * 2 ** attempt
+    
+    def wait_for_rate_limit(self, response: requests.Response):
+        """Sleep until the rate limit resets if *response* shows it is (nearly) used up."""
+        remaining = response.headers.get('x-ratelimit-remaining')
+        reset_header = response.headers.get('x-ratelimit-reset')
+        if remaining is None or not remaining.isdigit() or int(remaining) > 1:
+            return
+        if reset_header and reset_header.isdigit():
+            reset_time = int(reset_header)
+            sleep_time = max(reset_time - int(time.time()) + 5, 60)
+            print(f"⏳ Rate limit nearly exhausted. Sleeping for {sleep_time} seconds...")
+            print(f"   Rate limit resets at: {time.ctime(reset_time)}")
+        else:
+            sleep_time = 60
+            print(f"⏳ Rate limit nearly exhausted. Sleeping for {sleep_time} seconds...")
+        time.sleep(sleep_time)
+    
+    def get_repo_stars_batch(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[int]]:
+        """
+        Get star counts for up to GRAPHQL_BATCH_SIZE repositories with one GraphQL request.
+        Missing or private repositories map to 0; None means the lookup failed.
+        """
+        results: Dict[Tuple[str, str], Optional[int]] = {}
+        pending = []
+        for pair in pairs:
+            repo_key = f"{pair[0]}/{pair[1]}"
+            if repo_key in self.repo_cache:
+                results[pair] = self.repo_cache[repo_key]
+            else:
+                pending.append(pair)
+        if not pending:
+            return results
+        
+        # One aliased field per repository; json.dumps gives valid GraphQL string literals
+        fields = [
+            f'r{i}: repository(owner: {json.dumps(org)}, name: {json.dumps(repo)}) {{ stargazerCount }}'
+            for i, (org, repo) in enumerate(pending)
+        ]
+        query = "query {\n" + "\n".join(fields) + "\n}"
+        headers = {'Authorization': f'bearer {self.github_token}', 'Content-Type': 'application/json'}
+        body = _dumps({'query': query})
+        
+        try:
+            response = self.session.post(GRAPHQL_URL, data=body, headers=headers)
+            for attempt in range(RATE_LIMIT_RETRIES):
+                if not self.is_rate_limited(response):
+                    break
+                # Primary or secondary rate limit - wait it out and retry
+                sleep_time = self.rate_limit_sleep_time(response, attempt)
+                print(f"⏳ GraphQL rate limit hit. Sleeping for {sleep_time} seconds (retry {attempt + 1}/{RATE_LIMIT_RETRIES})...")
+                time.sleep(sleep_time)
+                response = self.session.post(GRAPHQL_URL, data=body, headers=headers)
+            
+            if response.status_code != 200:
+                print(f"  ❌ GraphQL batch error: HTTP {response.status_code}")
+                with self.stats_lock:
+                    self.error_count += 1
+                results.update((pair, None) for pair in pending)
+                return results
+            
+            # Large batch payloads - parsed straight from bytes
+            data = _loads(response.content).get('data')
+            if data is None:
+                print(f"  ❌ GraphQL batch error: {response.text[:200]}")
+                with self.stats_lock:
+                    self.error_count += 1
+                results.update((pair, None) for pair in pending)
+                return results
+            
+            for i, pair in enumerate(pending):
+                # A null alias means the repository is missing or private (NOT_FOUND)
+                repo = data.get(f'r{i}')
+                stars = (repo or {}).get('stargazerCount') or 0
+                self.repo_cache[f"{pair[0]}/{pair[1]}"] = stars
+                results[pair] = stars
+            
+            self.wait_for_rate_limit(response)
+            return results
+            
+        except (requests.RequestException, ValueError) as e:
+            print(f"  ❌ GraphQL request error: {e}")
+            with self.stats_lock:
+                self.error_count += 1
+            results.update((pair, None) for pair in pending)
+            return results
+    
+    def iter_repo_stars(self, repos: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str, Optional[int]]]:
+        """
+        Yield (org, repo, stars) for *repos*. With a token the lookups are batched
+        through GraphQL, several batches concurrently; without one (GraphQL requires
+        auth) each repo is fetched through the REST API. Repos checked within
+        STARS_CACHE_TTL are served from the database.
+        """
+        if not self.github_token:
+            for org, repo in repos:
+                yield org, repo, self.get_repo_stars(org, repo)
+            return
+        
+        # A few batches are kept in flight so network round trips overlap, while
+        # results are still yielded (and written) in order by the caller
+        in_flight = deque()
+        chunk = []
+        try:
+            with ThreadPoolExecutor(max_workers=GRAPHQL_CONCURRENCY) as executor:
+                for org, repo in repos:
+                    # Recently checked repos are answered straight from the cache
+                    fresh = self.get_fresh_stars(org, repo)
+                    if fresh is not None:
+                        yield org, repo, fresh
+                        continue
+                    
+                    chunk.append((org, repo))
+                    if len(chunk) < GRAPHQL_BATCH_SIZE:
+                        continue
+                    in_flight.append((chunk, executor.submit(self.get_repo_stars_batch, chunk)))
+                    chunk = []
+                    if len(in_flight) < GRAPHQL_CONCURRENCY:
+                        continue
+                    done, future = in_flight.popleft()
+                    yield from self._finish_batch(done, future.result())
+                
+                if chunk:
+                    in_flight.append((chunk, executor.submit(self.get_repo_stars_batch, chunk)))
+                while in_flight:
+                    chunk, future = in_flight.popleft()
+                    yield from self._finish_batch(chunk, future.result())
+        finally:
+            # Interrupted (Ctrl+C): the executor has let the in-flight batches finish, so
+            # keep their results - the next run serves them from the cache, not the API
+            saved = 0
+            for chunk, future in in_flight:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    saved += self._store_batch_meta(chunk, future.result())
+            if saved:
+                print(f"💾 Kept {saved} already fetched star counts for the next run")
+    
+    def _store_batch_meta(self, chunk: List[Tuple[str, str]],
+                          stars: Dict[Tuple[str, str], Optional[int]]) -> int:
+        """Store the successful lookups of a GraphQL batch in repo_meta and return how many."""
+        rows = [(org, repo, None, stars[(org, repo)])
+                for org, repo in chunk if stars.get((org, repo)) is not None]
+        self.store_repo_meta(rows)
+        return len(rows)
+    
+    def _finish_batch(self, chunk: List[Tuple[str, str]],
+                      stars: Dict[Tuple[str, str], Optional[int]]) -> Iterator[Tuple[str, str, Optional[int]]]:
+        """Record a completed GraphQL batch in the cache and yield its results in order."""
+        self._store_batch_meta(chunk, stars)
+        for org, repo in chunk:
+            yield org, repo, stars.get((org, repo))
+    
     def update_repo_stars_batch(self, repo_updates: List[Tuple[str, str, int]]):
         """Update star counts for multiple repositories in a single transaction."""
+        db = self.get_db()
+        if db is None:
+            print(f"  ❌ Database batch update error: {self.db_file} not available")
+            return 0
+        
         try:
-            db = sqlite3.connect(self.db_file)
             cur = db.cursor()
-            
-            total_rows_updated = 0
-            for org_name, repo_name, stars in repo_updates:
-                cur.execute("""
-                    UPDATE pushes 
-                    SET stars = ? 
-                    WHERE repo_org = ? AND repo_name = ?
-                """, (stars, org_name, repo_name))
-                total_rows_updated += cur.rowcount
-            
-            db.commit()
-            db.close()
+            cur.execute("BEGIN")
+            # Stage the batch, then apply it with one indexed UPDATE
+            cur.execute("DELETE FROM star_updates")
+            cur.executemany("INSERT OR REPLACE INTO star_updates VALUES (?, ?, ?)", repo_updates)
+            cur.execute("""
+                UPDATE pushes 
+                SET stars = (
+                    SELECT stars FROM star_updates
+                    WHERE org = pushes.repo_org AND name = pushes.repo_name
+                )
+                WHERE (repo_org, repo_name) IN (SELECT org, name FROM star_updates)
+            """)
+            total_rows_updated = cur.rowcount
+            cur.execute("COMMIT")
             
             return total_rows_updated
             
         except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
             print(f"  ❌ Database batch update error: {e}")
             return 0
     
     def update_repo_stars_in_db(self, org_name: str, repo_name: str, stars: int):
         """Update the star count for all matching records in the database (single repo)."""
+        db = self.get_db()
+        if db is None:
+            print(f"  ❌ Database error updating {org_name}/{repo_name}: {self.db_file} not available")
+            return 0
+        
         try:
-            db = sqlite3.connect(self.db_file)
-            cur = db.cursor()
-            
-            # Update all records for this org/repo combination
-            cur.execute("""
+            # Update all records for this org/repo combination (autocommit)
+            cur = db.execute("""
                 UPDATE pushes 
                 SET stars = ? 
                 WHERE repo_org = ? AND repo_name = ?
             """, (stars, org_name, repo_name))
             
-            rows_updated = cur.rowcount
-            db.commit()
-            db.close()
-            
-            return rows_updated
+            return cur.rowcount
             
         except sqlite3.Error as e:
             print(f"  ❌ Database error updating {org_name}/{repo_name}: {e}")
             return 0
     
-    def get_repos_to_update(self) -> List[Tuple[str, str]]:
-        """Get list of unique repo_org/repo_name pairs that need star count updates."""
+    def get_repos_to_update(self) -> Tuple[int, Iterator[Tuple[str, str]]]:
+        """
+        Find the unique repo_org/repo_name pairs that need star count updates.
+        Returns their number and an iterator streaming them in (org, name) order.
+        """
+        db = self.get_db()
+        if db is None:
+            print(f"❌ Error querying database: {self.db_file} not available")
+            return 0, iter(())
+        
         try:
-            db = sqlite3.connect(self.db_file)
             cur = db.cursor()
             
-            # Get unique repos that have NULL stars (need updating)
+            # Count unique repos that have NULL stars (need updating) - a pass over
+            # the idx_null_stars partial index that keeps no rows in memory
             print("📊 Checking which repositories need star count updates...")
             
             cur.execute("""
-                SELECT DISTINCT repo_org, repo_name 
-                FROM pushes 
-                WHERE repo_org IS NOT NULL 
-                  AND repo_name IS NOT NULL 
-                  AND stars IS NULL
-                LIMIT 5
-            """)
-            sample_repos = cur.fetchall()
-            
-            if sample_repos:
-                print(f"   Found repositories needing updates. Sample: {sample_repos[:3]}")
-                
-                # Get the full list
-                cur.execute("""
+                SELECT COUNT(*) FROM (
                     SELECT DISTINCT repo_org, repo_name 
-                    FROM pushes 
+                    FROM pushes INDEXED BY idx_null_stars
                     WHERE repo_org IS NOT NULL 
                       AND repo_name IS NOT NULL 
                       AND stars IS NULL
-                    ORDER BY repo_org, repo_name
-                """)
-                repos = cur.fetchall()
-                print(f"   Total repositories to update: {len(repos)}")
-            else:
-                # Check if ALL repositories need updates (stars column is completely empty)
-                cur.execute("SELECT COUNT(*) FROM pushes WHERE stars IS NOT NULL AND stars >= 0")
-                repos_with_data = cur.fetchone()[0]
-                
-                if repos_with_data == 0:
-                    print("   Stars column appears to be completely empty - will update ALL repositories")
-                    cur.execute("""
+                )
+            """)
+            total = cur.fetchone()[0]
+            
+            if total:
+                print(f"   Total repositories to update: {total}")
+                return total, self.iter_repos(only_missing=True)
+            
+            # Check if ALL repositories need updates (stars column is completely empty);
+            # stops at the first row with data instead of counting them all
+            cur.execute("SELECT 1 FROM pushes WHERE stars IS NOT NULL AND stars >= 0 LIMIT 1")
+            
+            if cur.fetchone() is None:
+                print("   Stars column appears to be completely empty - will update ALL repositories")
+                cur.execute("""
+                    SELECT COUNT(*) FROM (
                         SELECT DISTINCT repo_org, repo_name 
                         FROM pushes 
                         WHERE repo_org IS NOT NULL 
                           AND repo_name IS NOT NULL
-                        ORDER BY repo_org, repo_name
-                    """)
-                    repos = cur.fetchall()
-                    print(f"   Total repositories to update: {len(repos)}")
-                else:
-                    print("   All repositories already have star data")
-                    repos = []
+                    )
+                """)
+                total = cur.fetchone()[0]
+                print(f"   Total repositories to update: {total}")
+                return total, self.iter_repos(only_missing=False)
             
-            db.close()
-            return repos
+            print("   All repositories already have star data")
+            return 0, iter(())
             
         except sqlite3.Error as e:
             print(f"❌ Error querying database: {e}")
-            return []
-
-def get_unique_repos_from_db(db_file: str = DEFAULT_DB_FILE) -> List[Tuple[str, str]]:
-    """Get distinct repo_org/repo_name pairs from the SQLite database."""
-    try:
-        db = sqlite3.connect(db_file)
-        cur = db.cursor()
+            return 0, iter(())
+    
+    def iter_repos(self, only_missing: bool) -> Iterator[Tuple[str, str]]:
+        """
+        Stream unique repo_org/repo_name pairs (optionally only those with NULL stars)
+        a page at a time. Each page is a separate keyset query that has finished before
+        its rows are yielded, so star updates can be written between pages.
+        """
+        db = self.get_db()
+        if db is None:
+            return
         
-        repos = []
-        for row in cur.execute('SELECT DISTINCT repo_org, repo_name FROM pushes WHERE repo_org IS NOT NULL AND repo_name IS NOT NULL ORDER BY repo_org, repo_name;'):
-            if row[0] and row[1]:
-                repos.append((row[0], row[1]))
+        source = "pushes"
+        where = "repo_org IS NOT NULL AND repo_name IS NOT NULL"
+        if only_missing:
+            # Left to itself the planner reads "stars IS NULL" as a probe on idx_stars
+            # and sorts every page; the partial index is already in (org, name) order
+            source += " INDEXED BY idx_null_stars"
+            where += " AND stars IS NULL"
+        first_page = f"""
+            SELECT DISTINCT repo_org, repo_name FROM {source}
+            WHERE {where}
+            ORDER BY repo_org, repo_name LIMIT ?
+        """
+        next_page = f"""
+            SELECT DISTINCT repo_org, repo_name FROM {source}
+            WHERE {where} AND (repo_org, repo_name) > (?, ?)
+            ORDER BY repo_org, repo_name LIMIT ?
+        """
         
-        db.close()
-        return repos
-    except Exception as e:
-        print(f"Error reading database: {e}")
-        return []
+        try:
+            page = db.execute(first_page, (REPO_PAGE_SIZE,)).fetchall()
+            while page:
+                yield from page
+                if len(page) < REPO_PAGE_SIZE:
+                    break
+                page = db.execute(next_page, (*page[-1], REPO_PAGE_SIZE)).fetchall()
+        except sqlite3.Error as e:
+            print(f"❌ Error querying database: {e}")
 
 def main():
     """Main function to update the database with star counts."""
@@ -350,7 +721,7 @@ def main():
     
     # Test API access with a simple request
     print("Testing GitHub API access...")
-    test_stars = star_counter.get_repo_stars("octocat", "Hello-World")
+    test_stars = star_counter.get_repo_stars("octocat", "Hello-World", use_cache=False)
     if test_stars is not None:
         print(f"✓ API test successful! octocat/Hello-World has {test_stars:,} stars")
     else:
@@ -366,32 +737,34 @@ def main():
     
     # Get repositories that need updating
     print("\nFinding repositories that need star count updates...")
-    repos_to_update = star_counter.get_repos_to_update()
+    total_repos, repos_to_update = star_counter.get_repos_to_update()
     
-    if not repos_to_update:
+    if not total_repos:
         print("✅ All repositories already have star counts!")
         
-        # Show some statistics
-        all_repos = get_unique_repos_from_db(DB_FILE)
-        print(f"📊 Total unique repositories in database: {len(all_repos)}")
-        
-        # Show a few examples with their star counts
+        # Show some statistics and a few examples, on the connection already open
         try:
-            db = sqlite3.connect(DB_FILE)
-            cur = db.cursor()
+            cur = star_counter.get_db().cursor()
+            
+            cur.execute("""
+                SELECT COUNT(*) FROM (
+                    SELECT DISTINCT repo_org, repo_name FROM pushes
+                    WHERE repo_org IS NOT NULL AND repo_name IS NOT NULL
+                )
+            """)
+            print(f"📊 Total unique repositories in database: {cur.fetchone()[0]}")
             
             print("\nSample repositories with star counts:")
             for row in cur.execute('SELECT DISTINCT repo_org, repo_name, stars FROM pushes WHERE stars IS NOT NULL ORDER BY stars DESC LIMIT 10;'):
                 org, repo, stars = row
                 print(f"  {org}/{repo}: {stars:,} stars")
-            
-            db.close()
         except Exception as e:
             print(f"Error showing examples: {e}")
         
+        star_counter.close()
         return
     
-    print(f"Found {len(repos_to_update)} repositories to update")
+    print(f"Found {total_repos} repositories to update")
     print(f"Processing in batches of {BATCH_SIZE}")
     print()
     
@@ -406,59 +779,51 @@ def main():
     
     batch_updates = []  # Store pending updates for batch processing
     
-    for i, (org, repo) in enumerate(repos_to_update, 1):
-        try:
-            print(f"[{i:4d}/{len(repos_to_update)}] {org}/{repo}", end="")
-            
-            # Get star count from GitHub
-            stars = star_counter.get_repo_stars(org, repo)
-            
-            if stars is not None:
-                # Add to batch
-                batch_updates.append((org, repo, stars))
-                
-                if stars == 0:
-                    print(f" → 0 stars (queued for batch update)")
-                    not_found_count += 1
-                else:
-                    print(f" → {stars:,} stars (queued for batch update)")
-                    success_count += 1
+    try:
+        for i, (org, repo, stars) in enumerate(star_counter.iter_repo_stars(repos_to_update), 1):
+            try:
+                print(f"[{i:4d}/{total_repos}] {org}/{repo}", end="")
                 
-                # Process batch when it reaches the batch size or at the end
-                if len(batch_updates) >= BATCH_SIZE or i == len(repos_to_update):
-                    print(f"\n   💾 Committing batch of {len(batch_updates)} repositories to database...")
+                if stars is not None:
+                    # Add to batch
+                    batch_updates.append((org, repo, stars))
                     
-                    rows_updated = star_counter.update_repo_stars_batch(batch_updates)
-                    print(f"   ✅ Updated {rows_updated} database records")
+                    if stars == 0:
+                        print(f" → 0 stars (queued for batch update)")
+                        not_found_count += 1
+                    else:
+                        print(f" → {stars:,} stars (queued for batch update)")
+                        success_count += 1
                     
-                    # Clear the batch
-                    batch_updates = []
+                    # Process batch when it reaches the batch size or at the end
+                    if len(batch_updates) >= BATCH_SIZE or i == total_repos:
+                        print(f"\n   💾 Committing batch of {len(batch_updates)} repositories to database...")
+                        
+                        rows_updated = star_counter.update_repo_stars_batch(batch_updates)
+                        print(f"   ✅ Updated {rows_updated} database records")
+                        
+                        # Clear the batch
+                        batch_updates = []
+                        print()
+                else:
+                    print(f" → Error occurred")
+                    error_count += 1
+                
+                total_processed += 1
+                
+                # Show progress every 25 repositories (but not when we just showed batch commit)
+                if i % 25 == 0 and len(batch_updates) < BATCH_SIZE:
+                    print(f"   📊 Progress: {i}/{total_repos} repositories processed")
+                    print(f"   📈 Stats so far: {success_count} success, {not_found_count} not found, {error_count} errors")
                     print()
-            else:
-                print(f" → Error occurred")
+                    
+            except Exception as e:
+                print(f" → Unexpected error: {e}")
                 error_count += 1
-            
-            total_processed += 1
-            
-            # Show progress every 25 repositories (but not when we just showed batch commit)
-            if i % 25 == 0 and len(batch_updates) < BATCH_SIZE:
-                print(f"   📊 Progress: {i}/{len(repos_to_update)} repositories processed")
-                print(f"   📈 Stats so far: {success_count} success, {not_found_count} not found, {error_count} errors")
-                print()
-                
-        except KeyboardInterrupt:
-            print("\n\n⚠️  Update interrupted by user")
-            
-            # Process any remaining batch updates before exiting
-            if batch_updates:
-                print(f"💾 Committing final batch of {len(batch_updates)} repositories...")
-                rows_updated = star_counter.update_repo_stars_batch(batch_updates)
-                print(f"✅ Updated {rows_updated} database records")
-            
-            break
-        except Exception as e:
-            print(f" → Unexpected error: {e}")
-            error_count += 1
+    except KeyboardInterrupt:
+        # Also covers an interrupt during a (batched) API request; the pending
+        # batch is committed below
+        print("\n\n⚠️  Update interrupted by user")
     
     # Process any remaining batch updates
     if batch_updates:
@@ -482,8 +847,7 @@ def main():
         
         # Show some quick stats
         try:
-            db = sqlite3.connect(DB_FILE)
-            cur = db.cursor()
+            cur = star_counter.get_db().cursor()
             
             # Total stars in database
             cur.execute("SELECT SUM(DISTINCT stars) FROM pushes WHERE stars > 0")
@@ -494,10 +858,10 @@ def main():
             for row in cur.execute('SELECT DISTINCT repo_org, repo_name, stars FROM pushes WHERE stars > 0 ORDER BY stars DESC LIMIT 5;'):
                 org, repo, stars = row
                 print(f"  {org}/{repo}: {stars:,} stars")
-            
-            db.close()
         except Exception as e:
             print(f"Error showing final stats: {e}")
+    
+    star_counter.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
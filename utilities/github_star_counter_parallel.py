@@ -15,6 +15,8 @@ Performance improvements:
 
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import sys
 import os
@@ -23,30 +25,82 @@ import threading
 import logging
 import signal
 import argparse
-from collections import defaultdict
-from typing import Dict, List, Tuple, Optional, Set
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+import functools
+from collections import OrderedDict, defaultdict, deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Optional, Set
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import heapq
+import itertools
 import queue
 from datetime import datetime
 
+# Fast JSON support (optional): orjson parses/serializes in C, stdlib json is the fallback
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
 # Configuration
 DEFAULT_DB_FILE = "force_push_commits.sqlite3"
 GITHUB_TOKEN = None  # Set this or use environment variable GITHUB_TOKEN
-RATE_LIMIT_DELAY = 0.1  # Reduced delay for parallel processing
-RATE_LIMIT_BUFFER = 50  # Keep this many requests as buffer before rate limit
+_GITHUB_TOKEN_ENV = os.environ.get('GITHUB_TOKEN')  # Read once at import
+_CPU_COUNT = os.cpu_count() or 4
+RATE_LIMIT_BUFFER = 50  # Keep this many requests as buffer before rate limit (at most 10% of the limit)
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 100  # Repositories looked up per GraphQL request (token required)
+API_TIMING_WINDOW = 2048  # API call durations kept for the average-call-time statistic
+REPO_PAGE_SIZE = 1000  # Repositories read from the database per keyset query
+CONSOLE_LINES_BUFFERED = 50  # Per-repository console lines written out together
+TOP_STARRED_KEPT = 10  # Most starred repositories listed in the run summary
+CACHE_SHARDS = 16  # Independent locks for the star cache (power of two)
+CACHE_SHARD_MAX_ENTRIES = 50_000  # Oldest entries per shard are evicted beyond this
 
 # Default values (will be calculated dynamically)
 DEFAULT_BATCH_SIZE = 100
 DEFAULT_MAX_WORKERS = 8
 
+def rate_limit_buffer(limit: int) -> int:
+    """Requests held back from an hourly *limit*; small limits (60 unauthenticated) keep 10%."""
+    return min(RATE_LIMIT_BUFFER, limit // 10)
+
+def make_http_adapter(max_workers: int) -> HTTPAdapter:
+    """
+    Keep-alive connection pool sized for the worker threads (the urllib3 default of 10
+    would drop sockets beyond that and re-handshake TLS), retrying transient 5xx errors.
+    """
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                    allowed_methods=["GET", "POST"], raise_on_status=False)
+    return HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers * 2, max_retries=retries)
+
+def open_db(db_file: str, **kwargs) -> sqlite3.Connection:
+    """
+    Connect to the database with per-connection tuning: fewer fsyncs, temp tables in
+    memory, a 64 MB page cache and memory-mapped reads. The journal mode is left alone
+    (no WAL) because the scanner opens this database read-only.
+    """
+    db = sqlite3.connect(db_file, **kwargs)
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-65536")
+    db.execute("PRAGMA mmap_size=268435456")
+    return db
+
 # Global flag for graceful shutdown
-shutdown_requested = False
+shutdown_event = threading.Event()  # Set on SIGINT/SIGTERM; waits wake up immediately
 
 def signal_handler(signum, frame):
     """Handle interrupt signals gracefully."""
-    global shutdown_requested
-    shutdown_requested = True
+    shutdown_event.set()
     print(f"\n🛑 Interrupt received (Ctrl+C). Gracefully shutting down...")
     print("   Please wait for current operations to complete...")
     print("   Press Ctrl+C again to force quit (may lose data)")
@@ -60,8 +114,9 @@ if hasattr(signal, 'SIGTERM'):
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+@functools.lru_cache(maxsize=1)
 def setup_logging():
-    """Set up logging to both file and console."""
+    """Set up logging to both file and console (once; later calls return the same logger)."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = f"star_counter_parallel_{timestamp}.log"
     
@@ -98,7 +153,7 @@ def calculate_optimal_settings(github_token: Optional[str], total_repos: int = 0
     logger = logging.getLogger(__name__)
     
     # Calculate MAX_WORKERS based on CPU cores and API rate limits
-    cpu_count = os.cpu_count() or 4
+    cpu_count = _CPU_COUNT
     
     if github_token:
         # With token: 5000 requests/hour = ~83 requests/minute
@@ -106,29 +161,8 @@ def calculate_optimal_settings(github_token: Optional[str], total_repos: int = 0
         # We want to leave headroom for rate limit management
         max_workers = min(cpu_count * 2, 16)  # Max 16 workers even on high-core systems
         
-        # Check initial rate limit to adjust workers
-        try:
-            session = requests.Session()
-            session.headers.update({
-                'Authorization': f'token {github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            })
-            response = session.get("https://api.github.com/rate_limit", timeout=10)
-            if response.status_code == 200:
-                rate_data = response.json()
-                core = rate_data.get('resources', {}).get('core', {})
-                remaining = core.get('remaining', 5000)
-                limit = core.get('limit', 5000)
-                
-                # If we have low remaining requests, reduce workers
-                if remaining < 500:
-                    max_workers = min(max_workers, 4)
-                    logger.info(f"Low API quota ({remaining}/{limit}), reducing workers to {max_workers}")
-                elif remaining < 1000:
-                    max_workers = min(max_workers, 8)
-                    logger.info(f"Medium API quota ({remaining}/{limit}), limiting workers to {max_workers}")
-        except Exception as e:
-            logger.warning(f"Could not check rate limit for worker calculation: {e}")
+        # No /rate_limit probe here: the remaining quota is read from every response's
+        # headers, and the in-flight permits shrink with it while the run is going
     else:
         # Without token: 60 requests/hour = 1 request/minute
         # Use minimal workers to avoid hitting rate limit
@@ -162,27 +196,135 @@ def calculate_optimal_settings(github_token: Optional[str], total_repos: int = 0
     
     return max_workers, batch_size
 
-@dataclass
-class RepoResult:
-    """Container for repository processing results."""
+class RepoResult(NamedTuple):
+    """
+    Container for repository processing results. A tuple (one is created per repository):
+    no per-instance dict, and the result loop unpacks it in one step.
+    """
     org: str
     repo: str
     stars: Optional[int]
     success: bool
     error_msg: Optional[str] = None
 
+class ShardedRepoCache:
+    """
+    Thread-safe repo_key -> stars cache split into CACHE_SHARDS independently locked
+    shards, so workers rarely contend, each bounded to CACHE_SHARD_MAX_ENTRIES (LRU).
+    """
+    
+    def __init__(self):
+        self.shards = [(OrderedDict(), threading.Lock()) for _ in range(CACHE_SHARDS)]
+    
+    def _shard(self, repo_key: str):
+        return self.shards[hash(repo_key) & (CACHE_SHARDS - 1)]
+    
+    def get(self, repo_key: str) -> Optional[int]:
+        entries, lock = self._shard(repo_key)
+        with lock:
+            stars = entries.get(repo_key)
+            if stars is not None:
+                entries.move_to_end(repo_key)
+            return stars
+    
+    def set(self, repo_key: str, stars: int):
+        entries, lock = self._shard(repo_key)
+        with lock:
+            entries[repo_key] = stars
+            entries.move_to_end(repo_key)
+            if len(entries) > CACHE_SHARD_MAX_ENTRIES:
+                entries.popitem(last=False)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by the workers: requests run unthrottled while
+    tokens last (up to *capacity*), then at *refill_rate* tokens per second.
+    """
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.refill_rate = refill_rate
+        self.last_refill = time.monotonic()
+        self.condition = threading.Condition()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+    
+    def acquire(self, tokens: float = 1) -> bool:
+        """Block until *tokens* are available and take them. Returns False on shutdown."""
+        with self.condition:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                if shutdown_event.is_set():
+                    return False
+                # Wake up at least every 5 seconds to notice shutdown requests
+                self.condition.wait(min((tokens - self.tokens) / self.refill_rate, 5))
+    
+    def set_rate(self, refill_rate: float, capacity: float):
+        """Re-size the bucket from the latest quota; a larger capacity (window reset) refills it."""
+        with self.condition:
+            self._refill()
+            if capacity > self.capacity:
+                self.tokens = capacity
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+            self.refill_rate = max(refill_rate, 0.001)
+            self.condition.notify_all()
+
+class AdaptivePermits:
+    """
+    Context-manager semaphore whose number of permits can be changed while workers hold
+    them: shrinking only takes effect as current holders release, so nothing is interrupted.
+    """
+    
+    def __init__(self, max_permits: int):
+        self.max_permits = max_permits
+        self.limit = max_permits
+        self.active = 0
+        self.condition = threading.Condition()
+    
+    def __enter__(self):
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+    
+    def resize(self, limit: int):
+        """Allow *limit* concurrent holders (clamped to 1..max_permits)."""
+        with self.condition:
+            self.limit = min(max(limit, 1), self.max_permits)
+            self.condition.notify_all()
+
 class RateLimitManager:
     """Thread-safe rate limit manager for GitHub API using dynamic response headers."""
     
-    def __init__(self, session: requests.Session, github_token: Optional[str], star_counter=None):
+    def __init__(self, session: requests.Session, github_token: Optional[str], star_counter=None,
+                 permits: Optional[AdaptivePermits] = None):
         self.session = session
         self.github_token = github_token
         self.star_counter = star_counter  # Reference to main counter for triggering saves
+        self.permits = permits  # In-flight request limit, scaled with the remaining quota
         self.lock = threading.Lock()
         self.last_check_time = 0
         self.remaining_requests = 5000 if github_token else 60
         self.reset_time = 0
         self.rate_limit_hit = False
+        self.headers_seen = False  # Status is reported once, from the first response
+        # Spend the quota (minus the safety buffer) freely, spread evenly over the hour once it runs low
+        budget = max(self.remaining_requests - rate_limit_buffer(self.remaining_requests), 1)
+        self.bucket = TokenBucket(budget, budget / 3600)
         
     def update_from_response_headers(self, response: requests.Response) -> bool:
         """Update rate limit status from GitHub API response headers. Returns True if rate limited."""
@@ -196,17 +338,38 @@ class RateLimitManager:
                 try:
                     self.remaining_requests = int(remaining_header)
                     self.reset_time = int(reset_header)
-                    limit = int(limit_header) if limit_header else 5000
+                    limit = int(limit_header) if limit_header else (5000 if self.github_token else 60)
                     
                     current_time = int(time.time())
                     time_to_reset = self.reset_time - current_time
                     
+                    if not self.headers_seen:
+                        self.headers_seen = True
+                        print(f"🔍 Current GitHub API rate limit status:")
+                        print(f"   Limit: {limit} requests/hour")
+                        print(f"   Remaining: {self.remaining_requests} requests")
+                        print(f"   Resets at: {time.ctime(self.reset_time)}")
+                        if 0 < self.remaining_requests < 100:
+                            print(f"⚠️  Warning: Low requests remaining ({self.remaining_requests})")
+                    
+                    # Re-size the shared token bucket to what is left of this window
+                    buffer = rate_limit_buffer(limit)
+                    budget = max(self.remaining_requests - buffer, 1)
+                    self.bucket.set_rate(budget / max(time_to_reset, 1), budget)
+                    
+                    # Fewer requests in flight as the window's quota runs down, more once it resets
+                    if self.permits:
+                        headroom = budget / max(limit - buffer, 1)
+                        self.permits.resize(max(round(self.permits.max_permits * headroom), 2))
+                    
                     # Log rate limit status updates periodically
                     if self.remaining_requests % 100 == 0 or self.remaining_requests < 50:
                         print(f"🔄 Rate limit update: {self.remaining_requests}/{limit} remaining, resets in {time_to_reset/60:.1f}min")
                     
                     # Check if we're rate limited
-                    if response.status_code == 403 and 'rate limit' in response.text.lower():
+                    # Header first; the body is only searched as raw bytes, never decoded to text
+                    if response.status_code == 403 and (self.remaining_requests == 0 or
+                                                        response.content.find(b'rate limit') >= 0):
                         self.rate_limit_hit = True
                         print(f"🚫 Rate limit hit! Remaining: {self.remaining_requests}, Reset: {time.ctime(self.reset_time)}")
                         
@@ -226,6 +389,21 @@ class RateLimitManager:
             
             return False
     
+    def mark_rate_limited(self):
+        """Flag the rate limit as hit when the response itself says so (GraphQL RATE_LIMITED)."""
+        with self.lock:
+            self.rate_limit_hit = True
+            print(f"🚫 Rate limit hit! Remaining: {self.remaining_requests}, Reset: {time.ctime(self.reset_time)}")
+            if self.star_counter:
+                print(f"💾 Rate limit triggered - saving progress to database...")
+                self.star_counter.save_progress_to_database(force=True)
+    
+    def clear_after_reset(self):
+        """Drop the exhausted state once the reset time has passed; the next response brings real numbers."""
+        with self.lock:
+            self.rate_limit_hit = False
+            self.remaining_requests = 5000 if self.github_token else 60
+    
     def get_wait_time_if_needed(self) -> int:
         """Get wait time if we're currently rate limited, 0 otherwise."""
         with self.lock:
@@ -252,11 +430,12 @@ class ParallelGitHubStarCounter:
             batch_size: Size of batches for database operations
             db_file: Path to SQLite database file
         """
-        self.github_token = github_token or os.environ.get('GITHUB_TOKEN')
+        self.github_token = github_token or _GITHUB_TOKEN_ENV
         self.max_workers = max_workers
         self.batch_size = batch_size
         self.db_file = db_file
         self.session = requests.Session()
+        self.session.mount("https://", make_http_adapter(max_workers))
         self.logger = logging.getLogger(__name__)
         
         if self.github_token:
@@ -264,136 +443,117 @@ class ParallelGitHubStarCounter:
                 'Authorization': f'token {self.github_token}',
                 'Accept': 'application/vnd.github.v3+json'
             })
+        # Built once; sent with every GraphQL batch
+        self.graphql_headers = {'Authorization': f'bearer {self.github_token}', 'Content-Type': 'application/json'}
         
-        self.repo_cache = {}  # Cache for individual repo data
-        self.rate_limiter = RateLimitManager(self.session, self.github_token, self)
+        self.repo_cache = ShardedRepoCache()  # Cache for individual repo data
+        # Caps concurrent HTTP requests independently of the thread count, so bursts
+        # stay below GitHub's secondary (abuse) rate limits; the rate limiter narrows
+        # it further as the quota runs low
+        self.inflight_sem = AdaptivePermits(min(self.max_workers, 10))
+        self.rate_limiter = RateLimitManager(self.session, self.github_token, self, self.inflight_sem)
         self.processed_count = 0
         self.error_count = 0
-        self.cache_lock = threading.Lock()
         
         # Performance tracking
         self.start_time = None
-        self.api_call_times = []
+        self.api_call_times = deque(maxlen=API_TIMING_WINDOW)  # Recent calls only; deque appends are thread-safe
+        self.console_lines = []  # Per-repository output waiting for _flush_console (result loop only)
         
         # Detailed logging counters
-        self.success_repos = []
-        self.not_found_repos = []
-        self.error_repos = []
+        # Only counts and the top starred repos are reported, so nothing per-repo is kept
+        self.success_count = 0
+        self.not_found_count = 0
+        self.failed_count = 0
+        self.top_starred = []  # Min-heap of (stars, repo) holding the TOP_STARRED_KEPT largest
         
         # Progress saving for periodic database updates
-        self.pending_updates = []  # Store results waiting to be written to DB
-        self.last_db_update_time = time.time()
+        self.pending_updates: Dict[Tuple[str, str], int] = {}  # (org, repo) -> stars waiting to be written; a retried repo keeps one entry
+        self.last_db_update_time = time.monotonic()
         self.db_update_interval = 1800  # 30 minutes in seconds
         self.updates_lock = threading.Lock()
+        self.db = None  # Shared write connection, see get_db()
+        self.db_lock = threading.Lock()
+        
+        # ETags for conditional requests: 304 Not Modified does not count against the quota.
+        # Workers read through per-thread connections; new ETags are saved with the stars
+        self.meta_local = threading.local()
+        self.meta_connections = []  # Every per-thread connection, closed in close(); guarded by db_lock
+        self.pending_etags = []  # (org, repo, etag, stars) waiting to be written, guarded by updates_lock
+        
+        # Saves are handed to a single writer thread, so a worker that triggers one (e.g. on
+        # a rate limit, while holding the rate limiter's lock) never waits on SQLite itself
+        self.write_queue = queue.Queue()  # (star updates, etags) batches; None stops the writer
+        self.rows_written = 0  # Updated by the writer thread only
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self.writer_thread.start()
         
         print(f"🚀 Initialized parallel processor with {max_workers} workers and batch size {batch_size}")
         print(f"💾 Periodic database saves: Every {self.db_update_interval/60:.0f} minutes or when rate limited")
         self.logger.info(f"Initialized parallel processor with {max_workers} workers and batch size {batch_size}")
         self.logger.info(f"Periodic database saves enabled: Every {self.db_update_interval/60:.0f} minutes or when rate limited")
+        self._warmup_pool()
         self.check_initial_rate_limit()
     
+    def _warmup_pool(self):
+        """
+        Open as many pooled connections as requests may run at once, so the workers' first
+        calls reuse live TLS connections instead of all handshaking together. HEAD on
+        /rate_limit does not count against the quota.
+        """
+        connections = self.inflight_sem.max_permits
+        
+        def open_connection(_):
+            try:
+                self.session.head("https://api.github.com/rate_limit", timeout=5)
+            except requests.RequestException:
+                pass  # The real requests will connect (and report errors) themselves
+        
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(open_connection, range(connections)))
+    
     def check_initial_rate_limit(self):
-        """Check and display current rate limit status, wait if rate limited."""
-        try:
-            if self.github_token:
-                response = self.session.get("https://api.github.com/rate_limit")
-                if response.status_code == 200:
-                    rate_data = response.json()
-                    core = rate_data.get('resources', {}).get('core', {})
-                    limit = core.get('limit', 0)
-                    remaining = core.get('remaining', 0)
-                    reset_time = core.get('reset', 0)
-                    
-                    print(f"🔍 Current GitHub API rate limit status:")
-                    print(f"   Limit: {limit} requests/hour")
-                    print(f"   Remaining: {remaining} requests")
-                    print(f"   Resets at: {time.ctime(reset_time)}")
-                    self.logger.info(f"GitHub API rate limit - Limit: {limit}, Remaining: {remaining}, Resets: {time.ctime(reset_time)}")
-                    
-                    # Check if we're rate limited or very close
-                    if remaining == 0:
-                        current_time = int(time.time())
-                        wait_time = reset_time - current_time + 5  # Add 5 second buffer
-                        
-                        print(f"🚫 RATE LIMITED! Need to wait {wait_time}s ({wait_time/60:.1f} minutes)")
-                        print(f"   Rate limit resets at: {time.ctime(reset_time)}")
-                        print(f"   Starting countdown wait...")
-                        self.logger.warning(f"Rate limited - waiting {wait_time}s until {time.ctime(reset_time)}")
-                        
-                        # Wait with countdown
-                        self._wait_for_rate_limit_reset(wait_time, reset_time)
-                        
-                        # Check again after wait
-                        print(f"⏰ Wait complete! Checking rate limit status again...")
-                        response = self.session.get("https://api.github.com/rate_limit")
-                        if response.status_code == 200:
-                            rate_data = response.json()
-                            core = rate_data.get('resources', {}).get('core', {})
-                            new_remaining = core.get('remaining', 0)
-                            print(f"✅ Rate limit reset! Now have {new_remaining} requests available")
-                            self.logger.info(f"Rate limit reset completed - {new_remaining} requests now available")
-                            remaining = new_remaining
-                        else:
-                            print(f"⚠️  Could not verify rate limit reset: HTTP {response.status_code}")
-                    
-                    elif remaining < 100:
-                        print(f"⚠️  Warning: Low requests remaining ({remaining})")
-                        self.logger.warning(f"Low API requests remaining: {remaining}")
-                    
-                    # Update rate limiter with current status
-                    self.rate_limiter.remaining_requests = remaining
-                    self.rate_limiter.reset_time = reset_time
-                        
-                else:
-                    print(f"⚠️  Could not check rate limit status: HTTP {response.status_code}")
-                    self.logger.warning(f"Could not check rate limit status: HTTP {response.status_code}")
-            else:
-                print("⚠️  No GitHub token - using unauthenticated requests")
-                print("   This will be VERY slow (60 requests/hour limit)")
-                print("   Consider setting GITHUB_TOKEN for 5000 requests/hour")
-                self.logger.warning("No GitHub token - using unauthenticated requests (60 requests/hour limit)")
-                
-        except Exception as e:
-            print(f"⚠️  Could not check initial rate limit: {e}")
-            self.logger.error(f"Could not check initial rate limit: {e}")
+        """
+        Explain where rate limit status comes from. There is no /rate_limit probe: the
+        status is read from the headers of the first real response (see RateLimitManager).
+        """
+        if self.github_token:
+            print("🔍 GitHub API rate limit status will be read from the first API response")
+        else:
+            print("⚠️  No GitHub token - using unauthenticated requests")
+            print("   This will be VERY slow (60 requests/hour limit)")
+            print("   Consider setting GITHUB_TOKEN for 5000 requests/hour")
+            self.logger.warning("No GitHub token - using unauthenticated requests (60 requests/hour limit)")
         
         print()  # Add blank line for readability
     
     def _wait_for_rate_limit_reset(self, wait_time: int, reset_time: int):
         """Wait for rate limit reset with countdown display."""
-        global shutdown_requested
-        
-        remaining_wait = wait_time
-        last_update = 0
+        deadline = time.monotonic() + wait_time
+        # Show countdown every 30 seconds for long waits, every 5 seconds for short waits
+        update_interval = 30 if wait_time > 300 else 5
         
-        while remaining_wait > 0 and not shutdown_requested:
-            # Show countdown every 30 seconds for long waits, every 5 seconds for short waits
-            update_interval = 30 if wait_time > 300 else 5
-            
-            if remaining_wait == wait_time or remaining_wait % update_interval == 0 or remaining_wait <= 10:
-                minutes_left = remaining_wait / 60
-                if minutes_left >= 1:
-                    print(f"   ⏳ Waiting... {remaining_wait}s remaining ({minutes_left:.1f} minutes)")
-                else:
-                    print(f"   ⏳ Waiting... {remaining_wait}s remaining")
-                
-                # Show estimated completion time
-                if remaining_wait > 60:
-                    completion_time = time.time() + remaining_wait
-                    print(f"   🕐 Will resume at: {time.ctime(completion_time)}")
+        while (remaining_wait := round(deadline - time.monotonic())) > 0:
+            minutes_left = remaining_wait / 60
+            if minutes_left >= 1:
+                print(f"   ⏳ Waiting... {remaining_wait}s remaining ({minutes_left:.1f} minutes)")
+            else:
+                print(f"   ⏳ Waiting... {remaining_wait}s remaining")
             
-            # Wait in 1-second chunks so we can respond to shutdown requests
-            time.sleep(1)
-            remaining_wait -= 1
+            # Show estimated completion time
+            if remaining_wait > 60:
+                completion_time = time.time() + remaining_wait
+                print(f"   🕐 Will resume at: {time.ctime(completion_time)}")
             
-            if shutdown_requested:
+            # Sleep until the next countdown line; a shutdown request ends the wait at once
+            if shutdown_event.wait(min(update_interval, remaining_wait)):
                 print(f"\n🛑 Shutdown requested during rate limit wait")
                 return
     
     def setup_database(self):
         """Add the stars column to the database if it doesn't exist."""
         try:
-            db = sqlite3.connect(self.db_file)
+            db = open_db(self.db_file)
             cur = db.cursor()
             
             # Check if stars column exists
@@ -408,14 +568,45 @@ class ParallelGitHubStarCounter:
             else:
                 print("✓ Stars column already exists")
             
-            # Create index for better query performance
-            try:
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_stars ON pushes(stars)")
-                cur.execute("CREATE INDEX IF NOT EXISTS idx_repo_org_name ON pushes(repo_org, repo_name)")
-                db.commit()
-                print("✓ Database indexes created")
-            except sqlite3.Error as e:
-                print(f"Note: Index creation warning: {e}")
+            # Create index for better query performance. A failure is fatal: the pending
+            # repo queries are pinned to idx_null_stars
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_stars ON pushes(stars)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_repo_org_name ON pushes(repo_org, repo_name)")
+            # Covering index for the force-push scanner's per-org lookup, which opens
+            # this database read-only and so cannot build it itself
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pushes_org_covering
+                ON pushes(repo_org, repo_name, before, timestamp)
+            """)
+            # Partial index holding only the repos still waiting for a star count,
+            # so finding pending work costs O(pending) instead of O(pushes)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_null_stars ON pushes(repo_org, repo_name)
+                WHERE stars IS NULL
+            """)
+            db.commit()
+            # Give the planner column statistics (sampled, so it stays quick on big tables)
+            cur.execute("PRAGMA analysis_limit=1000")
+            cur.execute("ANALYZE")
+            db.commit()
+            print("✓ Database indexes created")
+            
+            # Per-repo ETag cache shared with github_star_counter.py (kept out of pushes,
+            # which has one row per push rather than per repo)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS repo_meta (
+                    repo_org TEXT NOT NULL,
+                    repo_name TEXT NOT NULL,
+                    etag TEXT,
+                    stars INTEGER,
+                    last_checked REAL,
+                    PRIMARY KEY (repo_org, repo_name)
+                )
+            """)
+            cur.execute("PRAGMA table_info(repo_meta)")
+            if 'last_checked' not in [row[1] for row in cur.fetchall()]:
+                cur.execute("ALTER TABLE repo_meta ADD COLUMN last_checked REAL")
+            db.commit()
             
             db.close()
             
@@ -423,62 +614,217 @@ class ParallelGitHubStarCounter:
             print(f"❌ Database setup error: {e}")
             sys.exit(1)
     
+    def _wait_if_rate_limited(self) -> bool:
+        """
+        Wait out an active rate limit, then take a token from the shared bucket.
+        Returns False if shutdown was requested meanwhile.
+        """
+        wait_time = self.rate_limiter.get_wait_time_if_needed()
+        if wait_time > 0:
+            print(f"⏳ Rate limit active - waiting {wait_time}s ({wait_time/60:.1f} min) before retry...")
+            
+            # Sleep in 30-second steps for the countdown; a shutdown request ends the wait at once
+            remaining_wait = wait_time
+            while remaining_wait > 0 and not shutdown_event.wait(min(30, remaining_wait)):
+                remaining_wait -= min(30, remaining_wait)
+                
+                # Show countdown for long waits
+                if wait_time > 60 and remaining_wait > 0:
+                    print(f"   ⏳ Still waiting... {remaining_wait}s remaining ({remaining_wait/60:.1f} min)")
+        
+        if shutdown_event.is_set():
+            return False
+        return self.rate_limiter.bucket.acquire()
+    
+    def fetch_stars_graphql(self, batch: List[Tuple[str, str]]) -> List[RepoResult]:
+        """
+        Get star counts for up to GRAPHQL_BATCH_SIZE repositories with one GraphQL request
+        (one rate-limit point instead of one REST call per repository). Falls back to REST
+        for the batch if GraphQL times out or answers 502/504.
+        """
+        if shutdown_event.is_set():
+            return [RepoResult(org, repo, None, False, "Shutdown requested") for org, repo in batch]
+        
+        results = []
+        pending = []
+        for org, repo in batch:
+            cached_stars = self.repo_cache.get(f"{org}/{repo}")
+            if cached_stars is not None:
+                results.append(RepoResult(org, repo, cached_stars, True))
+            else:
+                pending.append((org, repo))
+        if not pending:
+            return results
+        
+        if not self._wait_if_rate_limited():
+            return results + [RepoResult(org, repo, None, False, "Shutdown requested during rate limit wait")
+                              for org, repo in pending]
+        
+        # One aliased field per repository; json.dumps gives valid GraphQL string literals
+        fields = [
+            f'r{i}: repository(owner: {json.dumps(org)}, name: {json.dumps(repo)}) {{ stargazerCount }}'
+            for i, (org, repo) in enumerate(pending)
+        ]
+        query = "query {\n" + "\n".join(fields) + "\n}"
+        
+        api_start_time = time.monotonic()
+        try:
+            with self.inflight_sem:
+                response = self.session.post(GRAPHQL_URL, data=_dumps({'query': query}), timeout=30,
+                                             headers=self.graphql_headers)
+        except requests.Timeout:
+            response = None
+        except requests.RequestException as e:
+            error_msg = str(e)
+            self.logger.error(f"GraphQL batch of {len(pending)} repositories: Request error - {error_msg}")
+            return results + [RepoResult(org, repo, None, False, error_msg) for org, repo in pending]
+        
+        if response is None or response.status_code in (502, 504):
+            # GraphQL gave up on the batch - look these repositories up one by one instead
+            self.logger.warning(f"GraphQL batch of {len(pending)} repositories failed "
+                                f"({'timeout' if response is None else f'HTTP {response.status_code}'}), falling back to REST")
+            return results + [self.get_repo_stars_worker(org, repo) for org, repo in pending]
+        
+        self.api_call_times.append(time.monotonic() - api_start_time)
+        is_rate_limited = self.rate_limiter.update_from_response_headers(response)
+        
+        try:
+            payload = _loads(response.content) if response.status_code == 200 else {}
+        except ValueError:
+            payload = {}
+        data = payload.get('data')
+        
+        if data is None:
+            errors = payload.get('errors') or []
+            if any(error.get('type') == 'RATE_LIMITED' for error in errors):
+                self.rate_limiter.mark_rate_limited()
+                is_rate_limited = True
+            if is_rate_limited or response.status_code == 429:
+                error_msg = "Rate limit hit - will retry after wait"
+            elif errors:
+                error_msg = f"GraphQL error: {errors[0].get('message', 'unknown')}"
+            else:
+                error_msg = f"HTTP {response.status_code}"
+            self.logger.warning(f"GraphQL batch of {len(pending)} repositories: {error_msg}")
+            return results + [RepoResult(org, repo, None, False, error_msg) for org, repo in pending]
+        
+        for i, (org, repo) in enumerate(pending):
+            # A null alias means the repository is missing or private (NOT_FOUND)
+            node = data.get(f'r{i}')
+            stars = (node or {}).get('stargazerCount') or 0
+            self.repo_cache.set(f"{org}/{repo}", stars)
+            if node is None:
+                self.logger.info("Repository %s/%s: Not found/private (0 stars)", org, repo)
+            else:
+                self.logger.info("Repository %s/%s: %d stars", org, repo, stars)
+            results.append(RepoResult(org, repo, stars, True))
+        
+        return results
+    
+    def _process_chunk(self, chunk: List[Tuple[str, str]]) -> List[RepoResult]:
+        """Look up one unit of work: a GraphQL batch with a token, a single REST call without."""
+        if self.github_token:
+            return self.fetch_stars_graphql(chunk)
+        return [self.get_repo_stars_worker(org, repo) for org, repo in chunk]
+    
+    def _console(self, line: str):
+        """Queue a per-repository console line; they are written in blocks, not one write each."""
+        self.console_lines.append(line)
+        if len(self.console_lines) >= CONSOLE_LINES_BUFFERED:
+            self._flush_console()
+    
+    def _flush_console(self):
+        """Write out queued console lines (before any other output, to keep the order)."""
+        if self.console_lines:
+            sys.stdout.write("\n".join(self.console_lines) + "\n")
+            sys.stdout.flush()
+            self.console_lines.clear()
+    
+    def _skip_duplicates(self, repos: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        """
+        Drop repeated (org, repo) pairs so no quota is spent on the same repository twice.
+        The database stream is DISTINCT and sorted, so comparing with the previous pair is
+        enough and keeps memory constant; the number dropped is kept in duplicates_skipped.
+        """
+        previous = None
+        for repo in repos:
+            if repo == previous:
+                self.duplicates_skipped += 1
+                continue
+            previous = repo
+            yield repo
+    
+    def _chunk_repos(self, repos: Iterable[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+        """Split repositories into work units (GraphQL needs auth, so one repo per unit without a token)."""
+        size = GRAPHQL_BATCH_SIZE if self.github_token else 1
+        repos = iter(repos)
+        while chunk := list(itertools.islice(repos, size)):
+            yield chunk
+    
+    def _submit_bounded(self, executor: ThreadPoolExecutor, chunks: Iterator[List[Tuple[str, str]]],
+                        in_flight: Dict[Future, List[Tuple[str, str]]]) -> Iterator[Tuple[List[Tuple[str, str]], Future]]:
+        """
+        Submit work units as earlier ones finish, keeping at most 2 * max_workers outstanding
+        (tracked in *in_flight*), and yield (chunk, future) for each completed unit.
+        """
+        limit = 2 * self.max_workers
+        while True:
+            for chunk in itertools.islice(chunks, limit - len(in_flight)):
+                in_flight[executor.submit(self._process_chunk, chunk)] = chunk
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future
+    
     def get_repo_stars_worker(self, org_name: str, repo_name: str) -> RepoResult:
         """Worker function to get star count for a specific repository (thread-safe)."""
-        global shutdown_requested
-        
         # Check for shutdown request before processing
-        if shutdown_requested:
+        if shutdown_event.is_set():
             return RepoResult(org_name, repo_name, None, False, "Shutdown requested")
         
         repo_key = f"{org_name}/{repo_name}"
         
         # Check cache first (thread-safe)
-        with self.cache_lock:
-            if repo_key in self.repo_cache:
-                cached_stars = self.repo_cache[repo_key]
-                return RepoResult(org_name, repo_name, cached_stars, True)
+        cached_stars = self.repo_cache.get(repo_key)
+        if cached_stars is not None:
+            return RepoResult(org_name, repo_name, cached_stars, True)
         
         # Check if we need to wait due to previous rate limit
-        wait_time = self.rate_limiter.get_wait_time_if_needed()
-        if wait_time > 0:
-            print(f"⏳ Rate limit active - waiting {wait_time}s ({wait_time/60:.1f} min) before retry...")
-            
-            # Wait in small chunks so we can respond to shutdown requests
-            remaining_wait = wait_time
-            while remaining_wait > 0 and not shutdown_requested:
-                chunk_wait = min(5, remaining_wait)  # Wait in 5-second chunks
-                time.sleep(chunk_wait)
-                remaining_wait -= chunk_wait
-                
-                # Show countdown for long waits
-                if wait_time > 60 and remaining_wait % 30 == 0 and remaining_wait > 0:
-                    print(f"   ⏳ Still waiting... {remaining_wait}s remaining ({remaining_wait/60:.1f} min)")
-                
-                if shutdown_requested:
-                    return RepoResult(org_name, repo_name, None, False, "Shutdown requested during rate limit wait")
+        if not self._wait_if_rate_limited():
+            return RepoResult(org_name, repo_name, None, False, "Shutdown requested during rate limit wait")
         
         # Check for shutdown request again after wait
-        if shutdown_requested:
+        if shutdown_event.is_set():
             return RepoResult(org_name, repo_name, None, False, "Shutdown requested")
         
         url = f"https://api.github.com/repos/{org_name}/{repo_name}"
-        api_start_time = time.time()
+        cached_meta = self.get_cached_etag(org_name, repo_name)
+        headers = {'If-None-Match': cached_meta[0]} if cached_meta else None
+        api_start_time = time.monotonic()
         
         try:
             # Make the API request
-            response = self.session.get(url, timeout=15)
-            api_duration = time.time() - api_start_time
+            with self.inflight_sem:
+                response = self.session.get(url, timeout=15, headers=headers)
+            api_duration = time.monotonic() - api_start_time
             self.api_call_times.append(api_duration)
             
             # Update rate limit status from response headers
             is_rate_limited = self.rate_limiter.update_from_response_headers(response)
             
-            if response.status_code == 404:
+            if response.status_code == 304 and cached_meta:
+                # Unchanged since the stored ETag - free of quota, reuse the stored count
+                stars = cached_meta[1]
+                self.repo_cache.set(repo_key, stars)
+                self.queue_etag(org_name, repo_name, cached_meta[0], stars)
+                self.logger.info("Repository %s: Not modified (%d stars)", repo_key, stars)
+                return RepoResult(org_name, repo_name, stars, True)
+            
+            elif response.status_code == 404:
                 # Repository not found or private
-                with self.cache_lock:
-                    self.repo_cache[repo_key] = 0
-                self.logger.info(f"Repository {repo_key}: Not found/private (0 stars)")
+                self.repo_cache.set(repo_key, 0)
+                self.logger.info("Repository %s: Not found/private (0 stars)", repo_key)
                 return RepoResult(org_name, repo_name, 0, True)
             
             elif response.status_code == 403:
@@ -490,29 +836,21 @@ class ParallelGitHubStarCounter:
                     return RepoResult(org_name, repo_name, None, False, error_msg)
                 else:
                     # Different 403 error (private repo, insufficient permissions, etc.)
-                    with self.cache_lock:
-                        self.repo_cache[repo_key] = 0
-                    self.logger.info(f"Repository {repo_key}: Access forbidden (0 stars)")
+                    self.repo_cache.set(repo_key, 0)
+                    self.logger.info("Repository %s: Access forbidden (0 stars)", repo_key)
                     return RepoResult(org_name, repo_name, 0, True)
             
             elif response.status_code == 200:
                 # Success!
-                data = response.json()
+                data = _loads(response.content)
                 stars = data.get('stargazers_count', 0)
                 
                 # Cache the result (thread-safe)
-                with self.cache_lock:
-                    self.repo_cache[repo_key] = stars
-                
-                # Log successful fetch with star count
-                if stars > 0:
-                    self.logger.info(f"Repository {repo_key}: {stars:,} stars")
-                else:
-                    self.logger.info(f"Repository {repo_key}: 0 stars")
+                self.repo_cache.set(repo_key, stars)
+                self.queue_etag(org_name, repo_name, response.headers.get('ETag'), stars)
                 
-                # Small delay to be nice to the API (with shutdown check)
-                if not shutdown_requested:
-                    time.sleep(RATE_LIMIT_DELAY)
+                # Log successful fetch with star count (formatted only if INFO is enabled)
+                self.logger.info("Repository %s: %d stars", repo_key, stars)
                 
                 return RepoResult(org_name, repo_name, stars, True)
             
@@ -531,54 +869,53 @@ class ParallelGitHubStarCounter:
             self.logger.error(f"Repository {repo_key}: {error_msg}")
             return RepoResult(org_name, repo_name, None, False, error_msg)
     
-    def process_repos_parallel(self, repos_to_process: List[Tuple[str, str]]) -> List[RepoResult]:
-        """Process multiple repositories in parallel using ThreadPoolExecutor with dynamic rate limiting."""
-        global shutdown_requested
-        
-        print(f"🔄 Processing {len(repos_to_process)} repositories with {self.max_workers} workers...")
+    def process_repos_parallel(self, repos_to_process: Iterable[Tuple[str, str]], total_repos: int) -> List[RepoResult]:
+        """
+        Process repositories in parallel using ThreadPoolExecutor with dynamic rate limiting.
+        repos_to_process may be a lazy stream; total_repos is only used for progress reporting.
+        """
+        print(f"🔄 Processing {total_repos} repositories with {self.max_workers} workers...")
         print(f"💡 Using dynamic rate limit detection from API response headers")
-        self.logger.info(f"Starting parallel processing of {len(repos_to_process)} repositories with {self.max_workers} workers")
+        self.logger.info(f"Starting parallel processing of {total_repos} repositories with {self.max_workers} workers")
         
         results = []
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         retry_queue = []  # Queue for rate-limited requests to retry
+        self.duplicates_skipped = 0
+        repos_to_process = self._skip_duplicates(repos_to_process)
         
+        # Threads rather than asyncio: in-flight requests are capped by inflight_sem (at most
+        # 10) and, with a token, each one covers a GraphQL batch of 100 repositories, so a
+        # handful of threads already saturates the quota; requests and sqlite3 block anyway
         try:
             with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit all tasks
-                future_to_repo = {
-                    executor.submit(self.get_repo_stars_worker, org, repo): (org, repo)
-                    for org, repo in repos_to_process
-                }
+                # Work units are GraphQL batches with a token, single repos without;
+                # future_to_chunk only holds the ones currently outstanding
+                future_to_chunk = {}
+                retry_futures = {}  # Same, for the rate-limit retry pass
                 
                 # Process completed tasks
                 completed_count = 0
                 last_progress_log = 0
+                percent_scale = 100.0 / max(total_repos, 1)
                 
-                for future in as_completed(future_to_repo):
-                    # Check for shutdown request
-                    if shutdown_requested:
-                        print(f"\n🛑 Shutdown requested. Cancelling remaining tasks...")
-                        self.logger.warning("Shutdown requested during parallel processing")
-                        
-                        # Cancel pending futures
-                        for pending_future in future_to_repo:
-                            if not pending_future.done():
-                                pending_future.cancel()
-                        break
-                    
-                    org, repo = future_to_repo[future]
-                    
+                for chunk, future in self._submit_bounded(executor, self._chunk_repos(repos_to_process), future_to_chunk):
                     try:
                         # Reduced timeout for better responsiveness
-                        result = future.result(timeout=20)
+                        chunk_results = future.result(timeout=20)
+                    except Exception as e:
+                        chunk_results = [RepoResult(org, repo, None, False, f"Future error: {e}") for org, repo in chunk]
+                        self.logger.error(f"Work unit of {len(chunk)} repositories: Future error: {e}")
+                    
+                    for result in chunk_results:
+                        org, repo, stars, success, error_msg = result
                         
                         # Check if this was a rate limit error that should be retried
-                        if (not result.success and result.error_msg and 
-                            "rate limit" in result.error_msg.lower()):
+                        if (not success and error_msg and 
+                            "rate limit" in error_msg.lower()):
                             # Add to retry queue instead of treating as final error
                             retry_queue.append((org, repo))
-                            print(f"  ⏸️  {org}/{repo}: Rate limited, queued for retry")
+                            self._console(f"  ⏸️  {org}/{repo}: Rate limited, queued for retry")
                             continue
                         
                         results.append(result)
@@ -587,13 +924,7 @@ class ParallelGitHubStarCounter:
                         self.add_result_to_pending(result)
                         
                         # Track results for detailed logging
-                        if result.success:
-                            if result.stars and result.stars > 0:
-                                self.success_repos.append((f"{org}/{repo}", result.stars))
-                            else:
-                                self.not_found_repos.append(f"{org}/{repo}")
-                        else:
-                            self.error_repos.append((f"{org}/{repo}", result.error_msg))
+                        self.track_result(result)
                         
                         completed_count += 1
                         
@@ -602,187 +933,256 @@ class ParallelGitHubStarCounter:
                             self.save_progress_to_database()
                         
                         # Progress reporting (console and log) - more frequent during shutdown
-                        progress_interval = 25 if not shutdown_requested else 5
+                        progress_interval = 25 if not shutdown_event.is_set() else 5
                         if (completed_count % progress_interval == 0 or completed_count <= 10 or 
                             completed_count - last_progress_log >= 50):
-                            elapsed = time.time() - self.start_time
+                            elapsed = time.monotonic() - self.start_time
                             rate = completed_count / elapsed if elapsed > 0 else 0
-                            remaining_work = len(repos_to_process) - completed_count - len(retry_queue)
+                            remaining_work = total_repos - completed_count - len(retry_queue)
                             eta = remaining_work / rate if rate > 0 else 0
                             
-                            status_msg = "🛑 SHUTTING DOWN" if shutdown_requested else "📊"
-                            progress_msg = (f"{status_msg} Progress: {completed_count}/{len(repos_to_process)} "
-                                          f"({completed_count/len(repos_to_process)*100:.1f}%) "
+                            status_msg = "🛑 SHUTTING DOWN" if shutdown_event.is_set() else "📊"
+                            progress_msg = (f"{status_msg} Progress: {completed_count}/{total_repos} "
+                                          f"({completed_count * percent_scale:.1f}%) "
                                           f"Rate: {rate:.1f}/sec ETA: {eta/60:.1f}min")
                             if retry_queue:
                                 progress_msg += f" | {len(retry_queue)} queued for retry"
+                            self._flush_console()
                             print(progress_msg)
                             self.logger.info(progress_msg.replace("📊 ", "").replace("🛑 SHUTTING DOWN ", ""))
                             last_progress_log = completed_count
                         
                         # Show individual results for first few and any interesting ones
-                        if completed_count <= 20 or (result.success and result.stars and result.stars > 1000):
-                            if result.success:
-                                if result.stars and result.stars > 0:
-                                    print(f"  ✅ {org}/{repo}: {result.stars:,} stars")
+                        if completed_count <= 20 or (success and stars and stars > 1000):
+                            if success:
+                                if stars and stars > 0:
+                                    self._console(f"  ✅ {org}/{repo}: {stars:,} stars")
                                 else:
-                                    print(f"  ⭕ {org}/{repo}: Not found/private")
+                                    self._console(f"  ⭕ {org}/{repo}: Not found/private")
                             else:
-                                print(f"  ❌ {org}/{repo}: {result.error_msg}")
+                                self._console(f"  ❌ {org}/{repo}: {error_msg}")
                         
-                        if not result.success:
+                        if not success:
                             self.error_count += 1
-                            
-                    except Exception as e:
-                        self.error_count += 1
-                        error_result = RepoResult(org, repo, None, False, f"Future error: {e}")
-                        results.append(error_result)
-                        self.error_repos.append((f"{org}/{repo}", f"Future error: {e}"))
-                        self.logger.error(f"Repository {org}/{repo}: Future error: {e}")
-                        if completed_count <= 10:
-                            print(f"  ❌ Future error for {org}/{repo}: {e}")
+                    
+                    # Check for shutdown request once this unit's results are kept
+                    if shutdown_event.is_set():
+                        self._flush_console()
+                        print(f"\n🛑 Shutdown requested. Cancelling remaining tasks...")
+                        self.logger.warning("Shutdown requested during parallel processing")
+                        
+                        # Cancel pending futures
+                        for pending_future in future_to_chunk:
+                            if not pending_future.done():
+                                pending_future.cancel()
+                        break
                 
                 # Handle retry queue if we have rate-limited requests
-                if retry_queue and not shutdown_requested:
+                self._flush_console()
+                if retry_queue and not shutdown_event.is_set():
                     print(f"\n🔄 Processing {len(retry_queue)} rate-limited repositories after wait...")
                     self.logger.info(f"Processing {len(retry_queue)} repositories from retry queue")
                     
                     # Submit retry tasks
-                    retry_futures = {
-                        executor.submit(self.get_repo_stars_worker, org, repo): (org, repo)
-                        for org, repo in retry_queue
-                    }
-                    
-                    for future in as_completed(retry_futures):
-                        if shutdown_requested:
-                            break
-                            
-                        org, repo = retry_futures[future]
+                    for chunk, future in self._submit_bounded(executor, self._chunk_repos(retry_queue), retry_futures):
                         try:
-                            result = future.result(timeout=20)
+                            chunk_results = future.result(timeout=20)
+                        except Exception as e:
+                            chunk_results = [RepoResult(org, repo, None, False, f"Retry error: {e}") for org, repo in chunk]
+                        
+                        for result in chunk_results:
+                            org, repo, stars, success, error_msg = result
                             results.append(result)
                             completed_count += 1
                             
                             # Add successful retry results to pending updates
                             self.add_result_to_pending(result)
                             
-                            if result.success:
-                                if result.stars and result.stars > 0:
-                                    self.success_repos.append((f"{org}/{repo}", result.stars))
-                                    print(f"  ✅ Retry {org}/{repo}: {result.stars:,} stars")
+                            self.track_result(result)
+                            if success:
+                                if stars and stars > 0:
+                                    self._console(f"  ✅ Retry {org}/{repo}: {stars:,} stars")
                                 else:
-                                    self.not_found_repos.append(f"{org}/{repo}")
-                                    print(f"  ⭕ Retry {org}/{repo}: Not found/private")
+                                    self._console(f"  ⭕ Retry {org}/{repo}: Not found/private")
                             else:
-                                self.error_repos.append((f"{org}/{repo}", result.error_msg))
-                                print(f"  ❌ Retry {org}/{repo}: {result.error_msg}")
-                                
-                        except Exception as e:
-                            error_result = RepoResult(org, repo, None, False, f"Retry error: {e}")
-                            results.append(error_result)
-                            self.error_repos.append((f"{org}/{repo}", f"Retry error: {e}"))
-                            print(f"  ❌ Retry error for {org}/{repo}: {e}")
+                                self._console(f"  ❌ Retry {org}/{repo}: {error_msg}")
+                        
+                        if shutdown_event.is_set():
+                            for pending_future in retry_futures:
+                                if not pending_future.done():
+                                    pending_future.cancel()
+                            break
                 
-                # If shutdown was requested, wait a bit for remaining tasks to complete
-                if shutdown_requested:
+                # If shutdown was requested, keep what the outstanding units fetched: finished
+                # ones (chunks of up to 100 repos) are read at once, running ones get a moment
+                if shutdown_event.is_set():
                     print("⏳ Waiting for active tasks to complete (max 5 seconds)...")
-                    remaining_futures = [f for f in future_to_repo if not f.done()]
+                    remaining_futures = [f for f in itertools.chain(future_to_chunk, retry_futures)
+                                         if not f.cancelled()]
                     if remaining_futures:
                         # Wait for remaining futures with timeout
                         for future in remaining_futures:
                             try:
-                                result = future.result(timeout=1)  # Short timeout
-                                results.append(result)
-                                completed_count += 1
+                                chunk_results = future.result(timeout=1)  # Short timeout
+                                for result in chunk_results:
+                                    org, repo, stars, success, error_msg = result
+                                    # Same routing as the main loop: rate-limited repos are
+                                    # left for the next run rather than counted as done
+                                    if (not success and error_msg and
+                                        "rate limit" in error_msg.lower()):
+                                        retry_queue.append((org, repo))
+                                        continue
+                                    results.append(result)
+                                    self.add_result_to_pending(result)
+                                    self.track_result(result)
+                                    completed_count += 1
+                                    if not success:
+                                        self.error_count += 1
                             except Exception:
                                 # Cancel if it takes too long
                                 future.cancel()
                     
-                    print(f"✅ Graceful shutdown completed. Processed {completed_count}/{len(repos_to_process)} repositories.")
-                    self.logger.info(f"Graceful shutdown completed. Processed {completed_count}/{len(repos_to_process)} repositories.")
+                    print(f"✅ Graceful shutdown completed. Processed {completed_count}/{total_repos} repositories.")
+                    self.logger.info(f"Graceful shutdown completed. Processed {completed_count}/{total_repos} repositories.")
         
         except KeyboardInterrupt:
             # This should be rare now due to signal handling, but just in case
             print(f"\n🛑 Force interrupt detected. Stopping immediately...")
             self.logger.error("Force interrupt detected during parallel processing")
-            shutdown_requested = True
+            shutdown_event.set()
+        
+        if self.duplicates_skipped:
+            print(f"🔁 Skipped {self.duplicates_skipped} duplicate repositories in the input")
+            self.logger.warning(f"Skipped {self.duplicates_skipped} duplicate repositories in the input")
+        
+        self._flush_console()
         
         # Performance summary
-        elapsed_time = time.time() - self.start_time
+        elapsed_time = time.monotonic() - self.start_time
         avg_api_time = sum(self.api_call_times) / len(self.api_call_times) if self.api_call_times else 0
         
         print(f"\n⚡ Parallel processing completed!")
         print(f"   Total time: {elapsed_time:.1f}s")
-        print(f"   Processing rate: {len(repos_to_process)/elapsed_time:.1f} repos/sec")
+        print(f"   Processing rate: {total_repos/elapsed_time:.1f} repos/sec")
         print(f"   Average API call time: {avg_api_time:.2f}s")
         print(f"   Speedup vs sequential: ~{self.max_workers*0.7:.1f}x estimated")
         
         # Log performance summary
         self.logger.info(f"Parallel processing completed in {elapsed_time:.1f}s")
-        self.logger.info(f"Processing rate: {len(repos_to_process)/elapsed_time:.1f} repos/sec")
+        self.logger.info(f"Processing rate: {total_repos/elapsed_time:.1f} repos/sec")
         self.logger.info(f"Average API call time: {avg_api_time:.2f}s")
         
         # Log detailed results summary
         self.logger.info(f"Results summary:")
-        self.logger.info(f"  Repositories with stars: {len(self.success_repos)}")
-        self.logger.info(f"  Repositories not found/private: {len(self.not_found_repos)}")
-        self.logger.info(f"  Repositories with errors: {len(self.error_repos)}")
+        self.logger.info(f"  Repositories with stars: {self.success_count}")
+        self.logger.info(f"  Repositories not found/private: {self.not_found_count}")
+        self.logger.info(f"  Repositories with errors: {self.failed_count}")
         
         # Log top starred repositories found
-        if self.success_repos:
-            top_starred = sorted(self.success_repos, key=lambda x: x[1], reverse=True)[:10]
-            self.logger.info("Top 10 most starred repositories processed:")
-            for repo, stars in top_starred:
+        if self.top_starred:
+            self.logger.info(f"Top {TOP_STARRED_KEPT} most starred repositories processed:")
+            for stars, repo in sorted(self.top_starred, reverse=True):
                 self.logger.info(f"  {repo}: {stars:,} stars")
         
         return results
     
+    def track_result(self, result: RepoResult):
+        """Count a finished result for the run summary and keep it if it is among the most starred."""
+        if not result.success:
+            self.failed_count += 1
+        elif not result.stars:
+            self.not_found_count += 1
+        else:
+            self.success_count += 1
+            entry = (result.stars, f"{result.org}/{result.repo}")
+            if len(self.top_starred) < TOP_STARRED_KEPT:
+                heapq.heappush(self.top_starred, entry)
+            elif entry > self.top_starred[0]:
+                heapq.heapreplace(self.top_starred, entry)
+    
+    def get_db(self) -> sqlite3.Connection:
+        """
+        Return the shared write connection, opening it on first use. It is kept for the
+        whole run (page cache and temp staging table survive between saves); callers
+        must hold db_lock, as saves can come from worker threads.
+        """
+        if self.db is None:
+            # Autocommit mode: writers issue explicit BEGIN IMMEDIATE / COMMIT
+            self.db = open_db(self.db_file, isolation_level=None, check_same_thread=False)
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS star_updates (org TEXT, name TEXT, stars INTEGER, PRIMARY KEY (org, name))")
+        return self.db
+    
+    def close(self):
+        """
+        Queue anything still pending (e.g. ETags from the API test), let the writer thread
+        finish the queued saves, then close the shared write connection.
+        """
+        if self.writer_thread.is_alive():
+            self.save_progress_to_database(force=True)
+            self.write_queue.put(None)
+            self.writer_thread.join()
+        with self.db_lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            for db in self.meta_connections:
+                db.close()
+            self.meta_connections.clear()
+    
     def update_repo_stars_batch(self, repo_updates: List[Tuple[str, str, int]]):
         """Update star counts for multiple repositories in a single transaction."""
-        try:
-            db = sqlite3.connect(self.db_file)
-            cur = db.cursor()
-            
-            total_rows_updated = 0
-            batch_details = []
-            
-            for org_name, repo_name, stars in repo_updates:
+        with self.db_lock:
+            try:
+                cur = self.get_db().cursor()
+                
+                # Stage the batch in a temp table, then apply it with one indexed UPDATE
+                # (same approach as github_star_counter.py). BEGIN IMMEDIATE takes the
+                # write lock up front instead of upgrading from a read lock halfway through
+                cur.execute("BEGIN IMMEDIATE")
+                cur.execute("DELETE FROM star_updates")
+                cur.executemany("INSERT OR REPLACE INTO star_updates VALUES (?, ?, ?)", repo_updates)
                 cur.execute("""
                     UPDATE pushes 
-                    SET stars = ? 
-                    WHERE repo_org = ? AND repo_name = ?
-                """, (stars, org_name, repo_name))
-                rows_updated = cur.rowcount
-                total_rows_updated += rows_updated
-                batch_details.append((f"{org_name}/{repo_name}", stars, rows_updated))
-            
-            db.commit()
-            db.close()
-            
-            # Log batch update details
-            self.logger.info(f"Database batch update completed: {len(repo_updates)} repositories, {total_rows_updated} rows updated")
-            for repo, stars, rows in batch_details:
-                self.logger.debug(f"  {repo}: {stars} stars → {rows} database rows updated")
-            
-            return total_rows_updated
-            
-        except sqlite3.Error as e:
-            error_msg = f"Database batch update error: {e}"
-            print(f"  ❌ {error_msg}")
-            self.logger.error(error_msg)
-            return 0
+                    SET stars = (
+                        SELECT stars FROM star_updates
+                        WHERE org = pushes.repo_org AND name = pushes.repo_name
+                    )
+                    WHERE (repo_org, repo_name) IN (SELECT org, name FROM star_updates)
+                """)
+                total_rows_updated = cur.rowcount
+                cur.execute("COMMIT")
+                
+            except sqlite3.Error as e:
+                if self.db is not None and self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                error_msg = f"Database batch update error: {e}"
+                print(f"  ❌ {error_msg}")
+                self.logger.error(error_msg)
+                return 0
+        
+        # Log batch update details
+        self.logger.info(f"Database batch update completed: {len(repo_updates)} repositories, {total_rows_updated} rows updated")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for org_name, repo_name, stars in repo_updates:
+                self.logger.debug("  %s/%s: %s stars", org_name, repo_name, stars)
+        
+        return total_rows_updated
     
     def should_update_database(self, force: bool = False) -> bool:
         """Check if database should be updated based on time interval or force flag."""
         if force:
             return True
         
-        current_time = time.time()
+        current_time = time.monotonic()
         time_since_last_update = current_time - self.last_db_update_time
         return time_since_last_update >= self.db_update_interval
     
-    def save_progress_to_database(self, force: bool = False) -> int:
-        """Save current progress to database and return number of records updated."""
+    def save_progress_to_database(self, force: bool = False, block: bool = False) -> int:
+        """
+        Hand the pending progress to the writer thread. With block=True, wait until every
+        queued save is written and return the number of records updated; otherwise return
+        the number of repositories queued.
+        """
         with self.updates_lock:
             if not self.pending_updates and not force:
                 return 0
@@ -790,117 +1190,209 @@ class ParallelGitHubStarCounter:
             if not self.should_update_database(force):
                 return 0
             
-            updates_to_save = list(self.pending_updates)  # Copy the list
-            
-            if not updates_to_save:
-                return 0
-            
-            print(f"💾 Periodic database save: {len(updates_to_save)} repositories...")
-            self.logger.info(f"Periodic database save initiated with {len(updates_to_save)} repositories")
+            updates_to_save = [(org, repo, stars) for (org, repo), stars in self.pending_updates.items()]
+            etags_to_save, self.pending_etags = self.pending_etags, []
             
-            # Update database in batches
-            total_rows_updated = 0
-            for i in range(0, len(updates_to_save), self.batch_size):
-                batch = updates_to_save[i:i + self.batch_size]
-                rows_updated = self.update_repo_stars_batch(batch)
-                total_rows_updated += rows_updated
-                
-                if len(updates_to_save) > self.batch_size:
-                    batch_msg = f"Save batch {i//self.batch_size + 1}: Updated {rows_updated} database records"
-                    print(f"   {batch_msg}")
-                    self.logger.info(batch_msg)
+            if updates_to_save:
+                print(f"💾 Periodic database save: {len(updates_to_save)} repositories...")
+                self.logger.info(f"Periodic database save initiated with {len(updates_to_save)} repositories")
             
             # Clear the pending updates and update timestamp
             self.pending_updates.clear()
-            self.last_db_update_time = time.time()
-            
-            print(f"✅ Progress saved! Updated {total_rows_updated} database records")
-            self.logger.info(f"Periodic database save completed: {total_rows_updated} records updated")
+            self.last_db_update_time = time.monotonic()
             
-            return total_rows_updated
+            rows_before = self.rows_written
+            if updates_to_save or etags_to_save:
+                self.write_queue.put((updates_to_save, etags_to_save))
+        
+        if block:
+            self.write_queue.join()
+            return self.rows_written - rows_before
+        return len(updates_to_save)
+    
+    def _writer_loop(self):
+        """Write queued saves one at a time until close() sends the stop sentinel."""
+        while True:
+            item = self.write_queue.get()
+            try:
+                if item is None:
+                    return
+                updates_to_save, etags_to_save = item
+                if etags_to_save:
+                    self._store_etags(etags_to_save)
+                if updates_to_save:
+                    # Everything pending goes through one staged UPDATE in one transaction
+                    total_rows_updated = self.update_repo_stars_batch(updates_to_save)
+                    self.rows_written += total_rows_updated
+                    print(f"✅ Progress saved! Updated {total_rows_updated} database records")
+                    self.logger.info(f"Periodic database save completed: {total_rows_updated} records updated")
+            except Exception as e:
+                # Keep the writer alive; the next save may well succeed
+                self.logger.error(f"Database writer error: {e}")
+            finally:
+                self.write_queue.task_done()
+    
+    def get_cached_etag(self, org_name: str, repo_name: str) -> Optional[Tuple[str, int]]:
+        """Return the stored (etag, stars) for a repository, or None if there is none."""
+        db = getattr(self.meta_local, 'db', None)
+        if db is None:
+            # check_same_thread=False only so close() can shut it; each thread still uses its own
+            db = self.meta_local.db = open_db(self.db_file, check_same_thread=False)
+            with self.db_lock:
+                self.meta_connections.append(db)
+        try:
+            row = db.execute(
+                "SELECT etag, stars FROM repo_meta WHERE repo_org = ? AND repo_name = ?",
+                (org_name, repo_name)
+            ).fetchone()
+        except sqlite3.Error:
+            return None  # repo_meta not created yet
+        if row and row[0] and row[1] is not None:
+            return row
+        return None
+    
+    def queue_etag(self, org_name: str, repo_name: str, etag: Optional[str], stars: int):
+        """Queue a repository's ETag and star count for the next database save."""
+        if etag:
+            with self.updates_lock:
+                self.pending_etags.append((org_name, repo_name, etag, stars, time.time()))
+    
+    def _store_etags(self, etags: List[Tuple[str, str, str, int, float]]):
+        """Write ETags to repo_meta. A failed write only costs conditional requests next run."""
+        with self.db_lock:
+            try:
+                db = self.get_db()
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany("""
+                    INSERT INTO repo_meta (repo_org, repo_name, etag, stars, last_checked)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(repo_org, repo_name) DO UPDATE SET
+                        etag = excluded.etag,
+                        stars = excluded.stars,
+                        last_checked = excluded.last_checked
+                """, etags)
+                db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.db is not None and self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                self.logger.warning(f"Could not save ETags: {e}")
     
     def add_result_to_pending(self, result: RepoResult):
         """Add a successful result to pending database updates."""
         if result.success and result.stars is not None:
             with self.updates_lock:
-                self.pending_updates.append((result.org, result.repo, result.stars))
+                self.pending_updates[(result.org, result.repo)] = result.stars
     
-    def get_repos_to_update(self) -> List[Tuple[str, str]]:
-        """Get list of unique repo_org/repo_name pairs that need star count updates."""
+    def get_repos_to_update(self) -> Tuple[int, Iterator[Tuple[str, str]]]:
+        """
+        Find the unique repo_org/repo_name pairs that need star count updates.
+        Returns their number and an iterator streaming them in (org, name) order.
+        """
         try:
-            db = sqlite3.connect(self.db_file)
+            db = open_db(self.db_file)
             cur = db.cursor()
             
-            # Get unique repos that have NULL stars (need updating)
+            # Count unique repos that have NULL stars (need updating) without keeping any rows
             print("📊 Checking which repositories need star count updates...")
             
             cur.execute("""
-                SELECT DISTINCT repo_org, repo_name 
-                FROM pushes 
-                WHERE repo_org IS NOT NULL 
-                  AND repo_name IS NOT NULL 
-                  AND stars IS NULL
-                LIMIT 5
-            """)
-            sample_repos = cur.fetchall()
-            
-            if sample_repos:
-                print(f"   Found repositories needing updates. Sample: {sample_repos[:3]}")
-                
-                # Get the full list
-                cur.execute("""
+                SELECT COUNT(*) FROM (
                     SELECT DISTINCT repo_org, repo_name 
-                    FROM pushes 
+                    FROM pushes INDEXED BY idx_null_stars
                     WHERE repo_org IS NOT NULL 
                       AND repo_name IS NOT NULL 
                       AND stars IS NULL
-                    ORDER BY repo_org, repo_name
-                """)
-                repos = cur.fetchall()
-                print(f"   Total repositories to update: {len(repos)}")
+                )
+            """)
+            total = cur.fetchone()[0]
+            only_missing = True
+            
+            if total:
+                print(f"   Total repositories to update: {total}")
             else:
                 # Check if ALL repositories need updates (stars column is completely empty)
-                cur.execute("SELECT COUNT(*) FROM pushes WHERE stars IS NOT NULL AND stars >= 0")
-                repos_with_data = cur.fetchone()[0]
+                cur.execute("SELECT 1 FROM pushes WHERE stars IS NOT NULL AND stars >= 0 LIMIT 1")
                 
-                if repos_with_data == 0:
+                if cur.fetchone() is None:
                     print("   Stars column appears to be completely empty - will update ALL repositories")
                     cur.execute("""
-                        SELECT DISTINCT repo_org, repo_name 
-                        FROM pushes 
-                        WHERE repo_org IS NOT NULL 
-                          AND repo_name IS NOT NULL
-                        ORDER BY repo_org, repo_name
+                        SELECT COUNT(*) FROM (
+                            SELECT DISTINCT repo_org, repo_name 
+                            FROM pushes 
+                            WHERE repo_org IS NOT NULL 
+                              AND repo_name IS NOT NULL
+                        )
                     """)
-                    repos = cur.fetchall()
-                    print(f"   Total repositories to update: {len(repos)}")
+                    total = cur.fetchone()[0]
+                    only_missing = False
+                    print(f"   Total repositories to update: {total}")
                 else:
                     print("   All repositories already have star data")
-                    repos = []
             
             db.close()
-            return repos
+            return total, (self.iter_repos(only_missing) if total else iter(()))
             
         except sqlite3.Error as e:
             print(f"❌ Error querying database: {e}")
-            return []
-
-def get_unique_repos_from_db(db_file: str) -> List[Tuple[str, str]]:
-    """Get distinct repo_org/repo_name pairs from the SQLite database."""
-    try:
-        db = sqlite3.connect(db_file)
-        cur = db.cursor()
+            return 0, iter(())
+    
+    def iter_repos(self, only_missing: bool) -> Iterator[Tuple[str, str]]:
+        """
+        Stream unique repo_org/repo_name pairs (optionally only those with NULL stars)
+        a page at a time. Each page is a separate keyset query that has finished before
+        its rows are yielded, so periodic saves can write to the database between pages.
+        """
+        source = "pushes"
+        where = "repo_org IS NOT NULL AND repo_name IS NOT NULL"
+        if only_missing:
+            # Left to itself the planner reads "stars IS NULL" as a probe on idx_stars
+            # and sorts every page; the partial index is already in (org, name) order
+            source += " INDEXED BY idx_null_stars"
+            where += " AND stars IS NULL"
+        first_page = f"""
+            SELECT DISTINCT repo_org, repo_name FROM {source}
+            WHERE {where}
+            ORDER BY repo_org, repo_name LIMIT ?
+        """
+        next_page = f"""
+            SELECT DISTINCT repo_org, repo_name FROM {source}
+            WHERE {where} AND (repo_org, repo_name) > (?, ?)
+            ORDER BY repo_org, repo_name LIMIT ?
+        """
         
-        repos = []
-        for row in cur.execute('SELECT DISTINCT repo_org, repo_name FROM pushes WHERE repo_org IS NOT NULL AND repo_name IS NOT NULL ORDER BY repo_org, repo_name;'):
-            if row[0] and row[1]:
-                repos.append((row[0], row[1]))
+        try:
+            db = open_db(self.db_file)
+        except sqlite3.Error as e:
+            print(f"❌ Error querying database: {e}")
+            return
         
+        try:
+            page = db.execute(first_page, (REPO_PAGE_SIZE,)).fetchall()
+            while page:
+                yield from page
+                if len(page) < REPO_PAGE_SIZE:
+                    break
+                page = db.execute(next_page, (*page[-1], REPO_PAGE_SIZE)).fetchall()
+        except sqlite3.Error as e:
+            print(f"❌ Error querying database: {e}")
+        finally:
+            db.close()
+
+def count_unique_repos_in_db(db_file: str) -> int:
+    """Count distinct repo_org/repo_name pairs (an index-only pass; no rows reach Python)."""
+    try:
+        db = open_db(db_file)
+        count = db.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT DISTINCT repo_org, repo_name FROM pushes
+                WHERE repo_org != '' AND repo_name != ''
+            )
+        """).fetchone()[0]
         db.close()
-        return repos
+        return count
     except Exception as e:
         print(f"Error reading database: {e}")
-        return []
+        return 0
 
 def main():
     """Main function to update the database with star counts using parallel processing."""
@@ -942,7 +1434,7 @@ Environment Variables:
     print()
     
     # Check for GitHub token
-    github_token = os.environ.get('GITHUB_TOKEN')
+    github_token = _GITHUB_TOKEN_ENV
     if not github_token:
         warning_msg = "No GITHUB_TOKEN environment variable set. Parallel processing will be very slow without a token!"
         print(f"⚠️  Warning: {warning_msg}")
@@ -964,23 +1456,25 @@ Environment Variables:
     
     # Get repository count for optimal settings calculation
     print("Analyzing repository data...")
-    repos_to_update = []
+    repo_count = 0
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = open_db(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT DISTINCT repo_org, repo_name 
-            FROM force_push_commits 
-            WHERE stars IS NULL OR stars = 0
+            SELECT COUNT(*) FROM (
+                SELECT DISTINCT repo_org, repo_name 
+                FROM pushes 
+                WHERE stars IS NULL OR stars = 0
+            )
         """)
-        repos_to_update = cursor.fetchall()
+        repo_count = cursor.fetchone()[0]
         conn.close()
     except Exception as e:
         print(f"⚠️  Could not get repo count: {e}")
         logger.warning(f"Could not get repo count for optimization: {e}")
     
     # Calculate optimal settings based on system resources and repo count
-    MAX_WORKERS, BATCH_SIZE = calculate_optimal_settings(github_token, len(repos_to_update))
+    MAX_WORKERS, BATCH_SIZE = calculate_optimal_settings(github_token, repo_count)
     print()
     
     # Initialize parallel star counter with calculated settings
@@ -990,6 +1484,18 @@ Environment Variables:
     print("Testing GitHub API access...")
     logger.info("Testing GitHub API access with octocat/Hello-World")
     test_result = star_counter.get_repo_stars_worker("octocat", "Hello-World")
+    wait_time = star_counter.rate_limiter.get_wait_time_if_needed()
+    if not test_result.success and wait_time > 0:
+        # The quota was already used up when we started: count down to the reset, then test again
+        reset_time = star_counter.rate_limiter.reset_time
+        print(f"🚫 RATE LIMITED! Need to wait {wait_time}s ({wait_time/60:.1f} minutes)")
+        print(f"   Rate limit resets at: {time.ctime(reset_time)}")
+        logger.warning(f"Rate limited at startup - waiting {wait_time}s until {time.ctime(reset_time)}")
+        star_counter._wait_for_rate_limit_reset(wait_time, reset_time)
+        if shutdown_event.is_set():
+            sys.exit(1)
+        star_counter.rate_limiter.clear_after_reset()
+        test_result = star_counter.get_repo_stars_worker("octocat", "Hello-World")
     if test_result.success and test_result.stars is not None:
         print(f"✓ API test successful! octocat/Hello-World has {test_result.stars:,} stars")
         logger.info(f"API test successful! octocat/Hello-World has {test_result.stars:,} stars")
@@ -1010,20 +1516,20 @@ Environment Variables:
     # Get repositories that need updating
     print("\nFinding repositories that need star count updates...")
     logger.info("Querying database for repositories needing star count updates")
-    repos_to_update = star_counter.get_repos_to_update()
+    total_repos, repos_to_update = star_counter.get_repos_to_update()
     
-    if not repos_to_update:
+    if not total_repos:
         print("✅ All repositories already have star counts!")
         logger.info("All repositories already have star counts - no work needed")
         
         # Show some statistics
-        all_repos = get_unique_repos_from_db(DB_FILE)
-        print(f"📊 Total unique repositories in database: {len(all_repos)}")
-        logger.info(f"Total unique repositories in database: {len(all_repos)}")
+        unique_repos = count_unique_repos_in_db(DB_FILE)
+        print(f"📊 Total unique repositories in database: {unique_repos}")
+        logger.info(f"Total unique repositories in database: {unique_repos}")
         
         # Show a few examples with their star counts
         try:
-            db = sqlite3.connect(DB_FILE)
+            db = open_db(DB_FILE)
             cur = db.cursor()
             
             print("\nTop 10 repositories by star count:")
@@ -1040,11 +1546,12 @@ Environment Variables:
             print(error_msg)
             logger.error(error_msg)
         
+        star_counter.close()
         return
     
-    print(f"Found {len(repos_to_update)} repositories to update")
+    print(f"Found {total_repos} repositories to update")
     print(f"Processing with {MAX_WORKERS} parallel workers")
-    logger.info(f"Found {len(repos_to_update)} repositories to update with {MAX_WORKERS} workers")
+    logger.info(f"Found {total_repos} repositories to update with {MAX_WORKERS} workers")
     print()
     
     # Process repositories in parallel
@@ -1053,25 +1560,22 @@ Environment Variables:
     print("-" * 50)
     
     try:
-        results = star_counter.process_repos_parallel(repos_to_update)
+        results = star_counter.process_repos_parallel(repos_to_update, total_repos)
         
         # Process results in batches
         print(f"\n💾 Updating database with {len(results)} results...")
         logger.info(f"Processing {len(results)} results for database update")
         
-        # First, save any remaining pending updates from periodic saves
-        remaining_pending = star_counter.save_progress_to_database(force=True)
-        if remaining_pending > 0:
-            print(f"📋 Also saved {remaining_pending} previously pending updates")
+        # Every successful result was queued for the periodic saves, so only what is
+        # still pending needs writing (not the whole result list a second time)
+        total_rows_updated = star_counter.save_progress_to_database(force=True, block=True)
         
-        batch_updates = []
         success_count = 0
         not_found_count = 0
         error_count = 0
         
         for result in results:
             if result.success and result.stars is not None:
-                batch_updates.append((result.org, result.repo, result.stars))
                 if result.stars == 0:
                     not_found_count += 1
                 else:
@@ -1079,20 +1583,8 @@ Environment Variables:
             else:
                 error_count += 1
         
-        # Update database in batches
-        total_rows_updated = 0
-        for i in range(0, len(batch_updates), BATCH_SIZE):
-            batch = batch_updates[i:i + BATCH_SIZE]
-            rows_updated = star_counter.update_repo_stars_batch(batch)
-            total_rows_updated += rows_updated
-            
-            if len(batch_updates) > BATCH_SIZE:
-                batch_msg = f"Batch {i//BATCH_SIZE + 1}: Updated {rows_updated} database records"
-                print(f"   {batch_msg}")
-                logger.info(batch_msg)
-        
-        print(f"✅ Database update completed! Updated {total_rows_updated} total records")
-        logger.info(f"Database update completed: {total_rows_updated} total records updated")
+        print(f"✅ Database update completed! Final save updated {total_rows_updated} records")
+        logger.info(f"Database update completed: final save updated {total_rows_updated} records")
         
     except KeyboardInterrupt:
         interrupt_msg = "Force interrupt detected (Ctrl+C pressed twice)"
@@ -1115,6 +1607,8 @@ Environment Variables:
         results = []
         success_count = not_found_count = error_count = 0
     
+    star_counter.close()
+    
     # Final summary
     print(f"\n{'='*65}")
     print("Final Summary:")
@@ -1137,7 +1631,7 @@ Environment Variables:
         
         # Show and log some quick stats
         try:
-            db = sqlite3.connect(DB_FILE)
+            db = open_db(DB_FILE)
             cur = db.cursor()
             
             # Top 5 most starred repos